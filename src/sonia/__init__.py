@@ -1,6 +1,11 @@
-from importlib import metadata
+def __getattr__(name: str) -> str:
+    # version is read from package metadata on first use (slow import)
+    if name == "__version__":
+        from importlib import metadata
 
-try:
-    __version__ = metadata.version("sonia")
-except metadata.PackageNotFoundError:
-    __version__ = "0.0.0"
+        try:
+            return metadata.version("sonia")
+        except metadata.PackageNotFoundError:
+            return "0.0.0"
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
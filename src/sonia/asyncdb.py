@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import ParamSpec, TypeVar
+
+from sonia import notedb as db
+from sonia.storage import Connection, engine_for
+
+
+__all__ = [
+    "AsyncNoteStore",
+]
+
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+## async note store ##
+# notedb functions run on a bounded pool of worker threads. each worker binds
+# its own connection to the database, so readers run concurrently and a slow
+# query only occupies its worker - never the event loop
+
+
+class AsyncNoteStore:
+    """Asyncio note database objects."""
+
+    def __init__(self, path: str | Path | None = None, max_workers: int = 4) -> None:
+        self.path: Path = Path(path or db.db_path).expanduser()
+        self.engine = engine_for(self.path)
+
+        self._connections: list[Connection] = []
+        self._lock = threading.Lock()  # first connection may migrate the schema
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="sonia-db",
+            initializer=self._bind_worker_connection,
+        )
+
+    def __repr__(self) -> str:
+        return f"AsyncNoteStore({str(self.path)!r})"
+
+    def _bind_worker_connection(self) -> None:
+        with self._lock:
+            con = db.open_connection(self.path, self.engine)
+            self._connections.append(con)
+
+        db.bind_connection(con, self.engine, self.path)
+
+    async def _run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run notedb function on a worker thread."""
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
+        )
+
+    async def close(self) -> None:
+        """Wait for running work, then close worker connections."""
+
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+
+    async def __aenter__(self) -> "AsyncNoteStore":
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.close()
+
+    ## notes ##
+
+    async def create_notes(self, entries: tuple[str, ...]) -> tuple[db.Note, ...]:
+        """Create notes. Return created notes."""
+        return await self._run(db.create_notes, entries)
+
+    async def get_notes(self, ids: tuple[int, ...] = ()) -> tuple[db.Note, ...]:
+        """Return identified notes. Return all if none identified."""
+        return await self._run(db.get_notes, ids)
+
+    async def get_note_matches(self, match: str) -> tuple[db.Note, ...]:
+        """Return notes containing text (case-insensitive)."""
+        return await self._run(db.get_note_matches, match)
+
+    async def get_note_unmatches(self, unmatch: str) -> tuple[db.Note, ...]:
+        """Return notes not containing text (case-insensitive)."""
+        return await self._run(db.get_note_unmatches, unmatch)
+
+    async def get_tag_matches(self, tag: str) -> tuple[db.Note, ...]:
+        """Return notes with tag."""
+        return await self._run(db.get_tag_matches, tag)
+
+    async def get_tag_unmatches(self, tag: str) -> tuple[db.Note, ...]:
+        """Return notes without tag."""
+        return await self._run(db.get_tag_unmatches, tag)
+
+    async def search_notes(self, search: str) -> tuple[db.Note, ...]:
+        """Return notes matching search words, best match first."""
+        return await self._run(db.search_notes, search)
+
+    async def update_note(self, id: int, message: str) -> db.Note | None:
+        """Replace message of identified note. Return updated note."""
+        return await self._run(db.update_note, id, message)
+
+    async def append_note(self, id: int, text: str) -> db.Note | None:
+        """Append text to identified note. Return updated note."""
+        return await self._run(db.append_note, id, text)
+
+    async def reset_note(self, id: int) -> db.Note | None:
+        """Renumber identified note as the newest note. Return reset note."""
+        return await self._run(db.reset_note, id)
+
+    async def change(
+        self,
+        ids: tuple[int, ...],
+        change_from: str,
+        change_to: str,
+        regex: bool = False,
+    ) -> tuple[db.Note, ...]:
+        """Replace text in identified notes. Return changed notes."""
+        return await self._run(db.change, ids, change_from, change_to, regex)
+
+    async def missing_ids(self, ids: tuple[int, ...]) -> tuple[int, ...]:
+        """Return identifiers that do not identify a note."""
+        return await self._run(db.missing_ids, ids)
+
+    async def delete_notes(
+        self, ids: tuple[int, ...], archive: bool = False
+    ) -> tuple[db.Note, ...]:
+        """Delete identified notes (archive if archive). Return deleted notes."""
+        return await self._run(db.delete_notes, ids, archive)
@@ -0,0 +1,124 @@
+import json
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from pathlib import Path
+
+from sonia import notedb as db
+
+
+__all__ = [
+    "load_view",
+    "caching_view",
+]
+
+
+## note view cache ##
+# list views are cached in the database sidecar directory (see notedb write
+# generation), one json file per view and options. a cached view is valid for
+# the write generation it was read at, and the database file it was read from
+# (a deleted or replaced database leaves its sidecar behind) - hits print
+# without opening the database. least recently used views are evicted beyond
+# CACHE_SIZE
+
+CACHE_SIZE = 4 * 1024 * 1024  # bytes of cached views per database
+VIEW_SUFFIX = ".view.json"
+
+
+def view_path(view: str, options: Sequence[object]) -> Path:
+    """Return cache file of view (name) with options."""
+
+    key = "-".join((view, *(str(option) for option in options)))
+
+    return db.sidecar_path() / f"{key}{VIEW_SUFFIX}"
+
+
+def load_view(view: str, options: Sequence[object]) -> list[db.Note] | None:
+    """Return cached notes of view, or None if there is no view cached for the
+    current write generation."""
+
+    path = view_path(view, options)
+
+    try:
+        with open(path) as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if cached["generation"] != db.get_generation():
+        return None
+
+    if cached.get("database") != database_identity():
+        return None
+
+    os.utime(path)  # recently used
+
+    return [
+        db.Note(id, datetime.fromisoformat(date), message)
+        for id, date, message in cached["notes"]
+    ]
+
+
+def caching_view(
+    view: str, options: Sequence[object], notes: Iterable[db.Note]
+) -> Iterator[db.Note]:
+    """Yield notes of view, caching them once all are read (and they fit)."""
+
+    # generation before reading - a write racing the read invalidates it
+    generation = db.get_generation()
+    database = database_identity()
+    rows: list[tuple[int, str, str]] | None = []
+    size = 0
+
+    for note in notes:
+        if rows is not None:
+            rows.append((note.id, note.date.isoformat(), note.message))
+            size += len(note.message) + 40
+            if size > CACHE_SIZE // 2:
+                rows = None  # too large to cache
+
+        yield note
+
+    if rows is not None and generation and database is not None:
+        store_view(view_path(view, options), generation, database, rows)
+
+
+def database_identity() -> list[int] | None:
+    """Return identity of the database file - inode, modification time and size
+    - or None if there is no file."""
+
+    try:
+        stat = db.get_path().stat()
+    except OSError:
+        return None
+
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def store_view(
+    path: Path, generation: str, database: list[int], rows: list[tuple[int, str, str]]
+) -> None:
+    """Write cached view, then evict least recently used views beyond the cache
+    size."""
+
+    temporary = path.with_name(f"{path.name}.{os.getpid()}")
+
+    try:
+        with open(temporary, "w") as file:
+            json.dump(
+                {"generation": generation, "database": database, "notes": rows}, file
+            )
+        os.replace(temporary, path)
+
+        views = sorted(
+            path.parent.glob(f"*{VIEW_SUFFIX}"),
+            key=lambda view: view.stat().st_mtime_ns,
+            reverse=True,
+        )
+        total = 0
+        for view in views:
+            total += view.stat().st_size
+            if total > CACHE_SIZE:
+                view.unlink()
+    except OSError:
+        pass  # unwritable sidecar - views are not cached
@@ -1,46 +1,145 @@
-import os
-from importlib import metadata
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Sequence
+from itertools import islice
+from pathlib import Path
 from random import randrange
+from typing import TYPE_CHECKING, NamedTuple
 
-from sonia import notedb as db
-from sonia import console_output as cons
+import sonia
+from sonia.lazy import lazy_import
+
+# command dependencies load on first use - cheap commands (version, decide,
+# errors) never import the database engines or rich
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from sonia import cache, query, server
+    from sonia import console_output as cons
+    from sonia import notedb as db
+else:
+    cache = lazy_import("sonia.cache")
+    cons = lazy_import("sonia.console_output")
+    db = lazy_import("sonia.notedb")
+    query = lazy_import("sonia.query")
+    server = lazy_import("sonia.server")
 
 
 __all__ = [
     "Command",
     "commands",
+    "dispatch",
 ]
 
 
+# execution functions send errors to the console, and return False if the
+# command failed (batch reports and stops at failed lines)
+ExecuteFunc = Callable[[tuple[str, ...]], bool | None]
+
+
 class Command:
     """Command behavior objects."""
 
-    def __init__(
-        self, ids: tuple[str, ...], execute_func: Callable[[tuple[str, ...]], None]
-    ) -> None:
+    def __init__(self, ids: tuple[str, ...], execute_func: ExecuteFunc) -> None:
         self.ids: tuple[str, ...] = ids
-        self.execute: Callable[[tuple[str, ...]], None] = execute_func
+        self.execute: ExecuteFunc = execute_func
 
     def __repr__(self) -> str:
         return f"Command({self.ids[0]!r}, {self.execute!r})"
 
-    def run(self, args: tuple[str, ...] = ()) -> None:
-        """Run (execute) command."""
-        self.execute(args)
+    def run(self, args: tuple[str, ...] = ()) -> bool:
+        """Run (execute) command. Return whether it succeeded."""
+        try:
+            return self.execute(args) is not False
+        except db.DuplicateNote as error:  # unique constraint violated
+            cons.send_error(str(error), self.ids[0])
+            return False
+
+
+## list options ##############################################################
+
+
+class ListOptions(NamedTuple):
+    """note list options (keyset pagination, date range)"""
+
+    before: int | None = None
+    limit: int | None = None
+    since: "datetime | None" = None
+    until: "datetime | None" = None
+
+
+LIST_OPTIONS_USAGE = "[--limit count] [--before nid] [--since date] [--until date]"
+
+DATE_OPTIONS = ("since", "until")
+
+
+def parse_list_options(
+    args: tuple[str, ...],
+) -> tuple[tuple[str, ...], ListOptions] | None:
+    """Split list options (--limit count, --before nid, --since date, --until
+    date) from command arguments. Dates are as in filters (7d, "this week",
+    2026-01-31). Send error and return None if an option is invalid."""
+
+    rest: list[str] = []
+    before: int | None = None
+    limit: int | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+
+    remaining = iter(args)
+    for arg in remaining:
+        name, equals, value = arg.partition("=")
+        field = name.removeprefix("--")
+        if field == name or field not in ListOptions._fields:
+            rest.append(arg)
+            continue
+
+        if not equals:
+            value = next(remaining, "")
+
+        if field in DATE_OPTIONS and value.lower() in query.CALENDAR_OFFSETS:
+            value = f"{value} {next(remaining, '')}"  # unquoted this week
+
+        try:
+            match field:
+                case "before":
+                    before = int(value)
+                case "limit":
+                    limit = int(value)
+                    if limit < 0:
+                        raise ValueError(value)
+                case "since":
+                    since = query.parse_date(value)
+                case "until":
+                    until = query.parse_date(value)
+        except ValueError:
+            cons.send_error("invalid option value", f"{name} {value}".strip())
+            return None
+
+    return tuple(rest), ListOptions(before, limit, since, until)
 
 
 ## add notes command ###########################################################
 
 
-def add_cmd_execute(messages: tuple[str, ...]) -> None:
+ADD_CHUNK_SIZE = 1_000  # lines read and inserted at a time (add -)
+CONFIRMATION_LIMIT = 20  # larger changes report counts, not notes
+
+
+def add_cmd_execute(messages: tuple[str, ...]) -> bool | None:
     """Add notes command execution function."""
 
+    match messages:
+        case ("-",):
+            return add_lines("-")
+        case ("--file", path):
+            return add_lines(path)
+        case (option,) if option.startswith("--file="):
+            return add_lines(option.removeprefix("--file="))
+
     if len(messages) < 1:
         cons.send_error(
             "no capture argument", 'sonia capture "message one" "message two" ...'
         )
-        return
+        return False
 
     conf_notes = db.create_notes(messages)
 
@@ -49,34 +148,115 @@ def add_cmd_execute(messages: tuple[str, ...]) -> None:
         cons.send_confirmation(note, "added")
 
 
+def add_lines(path: str) -> bool | None:
+    """Add a note per (non-blank) line of file, or of stdin ("-"). Lines are
+    inserted in chunks - large captures report counts."""
+
+    import sys
+    from contextlib import ExitStack
+
+    count = 0
+    conf_notes: list[db.Note] = []
+
+    with ExitStack() as stack:
+        try:
+            lines = (
+                sys.stdin
+                if path == "-"
+                else stack.enter_context(open(path, errors="replace"))
+            )
+        except OSError:
+            cons.send_error("could not read file", path)
+            return False
+
+        entries = (entry for line in lines if (entry := line.strip()))
+
+        while chunk := tuple(islice(entries, ADD_CHUNK_SIZE)):
+            notes = db.create_notes(chunk)
+            count += len(notes)
+
+            if count <= CONFIRMATION_LIMIT:
+                conf_notes += notes
+            else:
+                cons.send_progress("adding", count)
+
+    cons.end_progress()
+
+    if count > CONFIRMATION_LIMIT:
+        cons.send_message(f"added {count} notes", "stdin" if path == "-" else path)
+        return
+
+    for note in conf_notes:
+        cons.send_confirmation(note, "added")
+
+
 add_cmd = Command(("add", "a", "capture", "cap"), add_cmd_execute)
 
 
-## list all notes command ##########################################################
+## filtered list commands ####################################################
+# note lists are filter expressions (see query) - predefined for the list
+# commands, or given to the query command
 
 
-def list_cmd_execute(_: tuple[str, ...] = ()) -> None:
-    """List notes command execution function."""
+LIST_FILTER = ""
+SHORT_LIST_FILTER = "not :que:"
+FOCUS_LIST_FILTER = ":mit: or :tod:"
 
-    os.system("clear -x")
 
-    # read database notes and send to console
-    cons.send_notes(db.get_notes(), reverse=True)
+def send_filtered_notes(
+    expression: str, options: ListOptions, clear_screen: bool = False, view: str = ""
+) -> bool | None:
+    """Stream notes matching filter expression (newest first) to console. Send
+    error and return False if the expression is malformed. Named views are cached until the next
+    database write (hits never open the database)."""
 
+    # date bounded views are not cached (relative dates move with the clock)
+    if options.since or options.until:
+        view = ""
 
-list_cmd = Command(("list", "ls", "long", "all"), list_cmd_execute)
+    if view and (cached := cache.load_view(view, options)) is not None:
+        if clear_screen:
+            cons.clear_screen()
+        cons.send_notes(cached)
+        return
 
+    try:
+        where = query.compile_filter(expression)
+    except query.FilterSyntaxError as error:
+        cons.send_error(f"invalid filter ({error})", expression)
+        return False
+
+    if clear_screen:
+        cons.clear_screen()
+
+    notes = db.select_notes(*where, descending=True, **options._asdict())
+
+    cons.send_notes(cache.caching_view(view, options, notes) if view else notes)
+
+
+def list_cmd_execute(args: tuple[str, ...] = ()) -> bool | None:
+    """List notes command execution function."""
 
-## short list command ##########################################################
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    _, options = parsed
 
+    return send_filtered_notes(LIST_FILTER, options, clear_screen=True, view="list")
 
-def short_list_cmd_execute(_: tuple[str, ...] = ()) -> None:
+
+list_cmd = Command(("list", "ls", "long", "all"), list_cmd_execute)
+
+
+def short_list_cmd_execute(args: tuple[str, ...] = ()) -> bool | None:
     """Limited (short) list command execution function. Ignore :que: tagged notes."""
 
-    os.system("clear -x")
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    _, options = parsed
 
-    # read database notes and send to console
-    cons.send_notes(db.get_tag_unmatches("que"), reverse=True)
+    return send_filtered_notes(
+        SHORT_LIST_FILTER, options, clear_screen=True, view="short"
+    )
 
 
 short_list_cmd = Command(
@@ -85,42 +265,65 @@ short_list_cmd = Command(
 )
 
 
-## focus list command ##########################################################
+def focus_list_cmd_execute(args: tuple[str, ...] = ()) -> bool | None:
+    """Focus list command execution function. Show :mit: and :tod: tagged notes."""
 
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    _, options = parsed
 
-def focus_list_cmd_execute(_: tuple[str, ...] = ()) -> None:
-    """Focus list command execution function. Show :mit: and :tod: tagged notes."""
+    return send_filtered_notes(
+        FOCUS_LIST_FILTER, options, clear_screen=True, view="focus"
+    )
 
-    os.system("clear -x")
 
-    # read database notes
-    db_notes = db.get_tag_matches("mit")
-    db_notes += db.get_tag_matches("tod")
+focus_list_cmd = Command(("focusls", "focus", "flist", "fls"), focus_list_cmd_execute)
 
-    # condition notes - remove duplicates and re-sort
-    conditioned_db_notes = tuple(sorted(set(db_notes), key=lambda note: note.id))
 
-    # send to console
-    cons.send_notes(conditioned_db_notes, reverse=True)
+def query_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Query command execution function. Show notes matching filter expression."""
 
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    args, options = parsed
+
+    if len(args) < 1:
+        cons.send_error(
+            "no filter expression",
+            f"sonia query ':mit: or :tod: and not :que:' {LIST_OPTIONS_USAGE}",
+        )
+        return False
+
+    return send_filtered_notes(" ".join(args), options)
 
-focus_list_cmd = Command(("focusls", "focus", "flist", "fls"), focus_list_cmd_execute)
+
+query_cmd = Command(("query", "q"), query_cmd_execute)
 
 
 ## search (general) command ####################################################
 
 
-def search_cmd_execute(args: tuple[str, ...]) -> None:
-    """Search notes command execution function. Show notes that match search term."""
+def search_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Search notes command execution function. Show notes that match search terms."""
+
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    args, options = parsed
 
     if len(args) < 1:
-        cons.send_error("no search argument", "sonia search search_term")
-        return
+        cons.send_error(
+            "no search argument", f"sonia search search_term ... {LIST_OPTIONS_USAGE}"
+        )
+        return False
+
+    search: str = " ".join(args)
 
-    match: str = args[0]
+    # read database notes (best match first), page them, and send to console
+    notes = db.search_notes(search, options.since, options.until)
+    if options.before is not None:
+        notes = tuple(note for note in notes if note.id < options.before)
 
-    # read database notes and send to console
-    cons.send_notes(db.get_note_matches(match), reverse=True)
+    cons.send_notes(notes[: options.limit])
 
 
 search_cmd = Command(("search", "s", "find", "f", "fd", "filter"), search_cmd_execute)
@@ -129,17 +332,23 @@ search_cmd = Command(("search", "s", "find", "f", "fd", "filter"), search_cmd_ex
 ## tag search command ##########################################################
 
 
-def tag_cmd_execute(args: tuple[str, ...]) -> None:
+def tag_cmd_execute(args: tuple[str, ...]) -> bool | None:
     """Search tag command execution function. Show notes that contain provided tag."""
 
+    if (parsed := parse_list_options(args)) is None:
+        return False
+    args, options = parsed
+
     if len(args) < 1:
-        cons.send_error("no tag search argument", "sonia tag tag_name")
-        return
+        cons.send_error(
+            "no tag search argument", f"sonia tag tag_name {LIST_OPTIONS_USAGE}"
+        )
+        return False
 
     tag: str = args[0].strip(":")
 
-    # read database notes and send to console
-    cons.send_notes(db.get_tag_matches(tag), reverse=True)
+    # stream database notes (newest first) to console
+    return send_filtered_notes(f":{tag}:", options)
 
 
 tag_cmd = Command(("tag", "t"), tag_cmd_execute)
@@ -148,14 +357,14 @@ tag_cmd = Command(("tag", "t"), tag_cmd_execute)
 ## update command ##############################################################
 
 
-def update_cmd_execute(args: tuple[str, ...]) -> None:
+def update_cmd_execute(args: tuple[str, ...]) -> bool | None:
     """Update note command execution function. Change note at provided note ID (nid)."""
 
     if len(args) < 2:
         cons.send_error(
             "not enough update arguments", "sonia update nid replacement_message"
         )
-        return
+        return False
 
     upd_note_id: str = args[0]
 
@@ -164,19 +373,16 @@ def update_cmd_execute(args: tuple[str, ...]) -> None:
         id: int = int(upd_note_id.strip())
     except ValueError:
         cons.send_error("invalid input", upd_note_id)
-        return
-
-    if not db.is_valid(id):
-        cons.send_error("not a valid note", str(id))
-        return
+        return False
 
     message: str = args[1]
 
-    # update note
-    db.update_note(id, message)
+    # update note (read back in the same transaction)
+    confirmation_note = db.update_note(id, message)
+    if confirmation_note is None:
+        cons.send_error("not a valid note", str(id))
+        return False
 
-    # read note back from database and send confirmation
-    confirmation_note, *_ = db.get_notes((id,))
     cons.send_confirmation(confirmation_note, "updated")
 
 
@@ -186,14 +392,14 @@ update_cmd = Command(("update", "upd", "u", "edit", "e"), update_cmd_execute)
 ## append command ##############################################################
 
 
-def append_cmd_execute(args: tuple[str, ...]) -> None:
+def append_cmd_execute(args: tuple[str, ...]) -> bool | None:
     """Append note command execution function. Append text to provided note ID (nid)."""
 
     if len(args) < 2:
         cons.send_error(
             "not enough append arguments", "sonia append nid text_to_append"
         )
-        return
+        return False
 
     app_note_id: str = args[0]
 
@@ -202,22 +408,16 @@ def append_cmd_execute(args: tuple[str, ...]) -> None:
         id: int = int(app_note_id.strip())
     except ValueError:
         cons.send_error("invalid input", app_note_id)
-        return
-
-    if not db.is_valid(id):
-        cons.send_error("not a valid note", str(id))
-        return
+        return False
 
     s: str = args[1]
 
-    # retrieve note
-    original_note, *_ = db.get_notes((id,))
-
-    # update note with appended message
-    db.update_note(id, original_note.message + " " + s)
+    # append to note (read back in the same transaction)
+    confirmation_note = db.append_note(id, s)
+    if confirmation_note is None:
+        cons.send_error("not a valid note", str(id))
+        return False
 
-    # read note back from database and send confirmation
-    confirmation_note, *_ = db.get_notes((id,))
     cons.send_confirmation(confirmation_note, "appended")
 
 
@@ -227,12 +427,12 @@ append_cmd = Command(("append", "app"), append_cmd_execute)
 ## reset command ###############################################################
 
 
-def reset_cmd_execute(args: tuple[str, ...]) -> None:
+def reset_cmd_execute(args: tuple[str, ...]) -> bool | None:
     """Reset note command execution function. Reset timestamp and note ID (nid)."""
 
     if len(args) < 1:
         cons.send_error("no note identifier provided", "sonia reset nid")
-        return
+        return False
 
     reset_note_id: str = args[0]
 
@@ -241,20 +441,13 @@ def reset_cmd_execute(args: tuple[str, ...]) -> None:
         id: int = int(reset_note_id.strip())
     except ValueError:
         cons.send_error("invalid input", reset_note_id)
-        return
+        return False
 
-    if not db.is_valid(id):
+    # replace original with a new note with the original message
+    confirmation_note = db.reset_note(id)
+    if confirmation_note is None:
         cons.send_error("not a valid note", str(id))
-        return
-
-    # retrieve original note
-    original_note, *_ = db.get_notes((id,))
-
-    # remove original
-    _ = db.delete_notes((id,))
-
-    # add new note with original message
-    confirmation_note, *_ = db.create_notes((original_note.message,))
+        return False
 
     # send confirmation
     cons.send_confirmation(confirmation_note, "reset")
@@ -263,39 +456,84 @@ def reset_cmd_execute(args: tuple[str, ...]) -> None:
 reset_cmd = Command(("reset", "refresh", "touch"), reset_cmd_execute)
 
 
-## delete command ##############################################################
-# delete selected database entries
+## delete and done commands ##################################################
+# delete removes notes for good - done moves them to the archive
 
 
-def delete_cmd_execute(nids: tuple[str, ...]) -> None:
-    """Delete note command execution function. Delete provided note IDs (nids)."""
+def remove_notes(nids: tuple[str, ...], archive: bool = False) -> bool | None:
+    """Delete provided note IDs (nids), archiving them if archive. Send
+    confirmations, or an error (and return False) if an id is invalid."""
 
     if len(nids) < 1:
-        cons.send_error("no argument", "sonia done nid_one nid_two ...")
-        return
+        command = "done" if archive else "delete"
+        cons.send_error("no argument", f"sonia {command} nid_one nid_two ...")
+        return False
 
     # check nids
     try:
         ids: tuple[int, ...] = tuple(int(nid.strip()) for nid in nids)
     except ValueError:
         cons.send_error("invalid input")
-        return
+        return False
 
-    for id in ids:
-        if not db.is_valid(id):
-            cons.send_error("not a valid note", str(id))
-            return
+    if missing := db.missing_ids(ids):
+        cons.send_error("not a valid note", str(missing[0]))
+        return False
 
     # delete notes and retrieve confirmation
-    conf_notes = db.delete_notes(ids)
+    conf_notes = db.delete_notes(ids, archive)
 
     for note in conf_notes:
-        cons.send_confirmation(note, "removed")
+        cons.send_confirmation(note, "archived" if archive else "removed")
 
 
-delete_cmd = Command(
-    ("delete", "d", "remove", "rm", "done", "drop", "complete"), delete_cmd_execute
-)
+def delete_cmd_execute(nids: tuple[str, ...]) -> bool | None:
+    """Delete note command execution function. Delete provided note IDs (nids)."""
+
+    return remove_notes(nids)
+
+
+delete_cmd = Command(("delete", "d", "remove", "rm", "drop"), delete_cmd_execute)
+
+
+def done_cmd_execute(nids: tuple[str, ...]) -> bool | None:
+    """Complete note command execution function. Archive provided note IDs
+    (nids)."""
+
+    return remove_notes(nids, archive=True)
+
+
+done_cmd = Command(("done", "complete"), done_cmd_execute)
+
+
+## archive command #############################################################
+# completed (done) notes are only read from the archive on request
+
+
+ARCHIVE_USAGE = "sonia archive search word ... | sonia archive stats"
+
+
+def archive_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Archive command execution function. Search archived notes, or summarize
+    the archive."""
+
+    match args:
+        case ("search", *words):
+            cons.send_notes(db.search_archive(" ".join(words)))
+        case ("stats",):
+            stats = db.archive_stats()
+            cons.send_message(f"{stats.count} archived notes", f"{stats.live} live")
+            for year, count in stats.years:
+                cons.send_message(year, f"{count} archived")
+            if stats.last_archived is not None:
+                last = stats.last_archived.strftime("%y.%m.%d %H:%M")
+                cons.send_message("last archived", last)
+        case _:
+            cons.send_error("invalid archive arguments", ARCHIVE_USAGE)
+            return False
+
+
+archive_cmd = Command(("archive",), archive_cmd_execute)
 
 
 ## clear command ###############################################################
@@ -329,48 +567,48 @@ rebase_cmd = Command(("rebase", "-rebase", "--rebase"), rebase_cmd_execute)
 ## change command ##############################################################
 
 
-def change_cmd_execute(args: tuple[str, ...] = ()) -> None:
-    """String replace all notes execution function."""
+def change_cmd_execute(args: tuple[str, ...] = ()) -> bool | None:
+    """String replace all notes execution function. Replace regular expression
+    matches with --regex."""
 
-    ids: tuple[int, ...] = ()
+    regex = "--regex" in args
+    args = tuple(arg for arg in args if arg != "--regex")
 
     # perform string replace on selected notes
-    match args:
-        case change_from, change_to:
-            # get ids for confirmation notes
-            ids = tuple(note.id for note in db.get_note_matches(change_from))
-
-            # update database
-            db.change_all(change_from, change_to)
-        case change_from, change_to, *nids:
-            # check nids
-            try:
-                ids = tuple(int(nid.strip()) for nid in nids)
-            except ValueError:
-                cons.send_error("invalid input")
-                return
-
-            for id in ids:
-                if not db.is_valid(id):
-                    cons.send_error("not a valid note", str(id))
-                    return
-
-            # update database
-            db.change(ids, change_from, change_to)
-        case _:
-            cons.send_error(
-                "missing argument(s)",
-                "sonia change from_text to_text \\[nid_one nid_two ...]",
-            )
-            return
-
-    if ids:
-        # read confirmations back for changed nids
-        conf_notes: tuple[db.Note, ...] = db.get_notes(ids)
+    try:
+        match args:
+            case change_from, change_to:
+                conf_notes = db.change_all(change_from, change_to, regex)
+            case change_from, change_to, *nids:
+                # check nids
+                try:
+                    ids = tuple(int(nid.strip()) for nid in nids)
+                except ValueError:
+                    cons.send_error("invalid input")
+                    return False
+
+                if missing := db.missing_ids(ids):
+                    cons.send_error("not a valid note", str(missing[0]))
+                    return False
+
+                conf_notes = db.change(ids, change_from, change_to, regex)
+            case _:
+                cons.send_error(
+                    "missing argument(s)",
+                    "sonia change from_text to_text \\[nid_one nid_two ...] [--regex]",
+                )
+                return False
+    except ValueError as error:
+        cons.send_error(str(error), args[0])
+        return False
+
+    # send confirmations (changed notes are returned by the update)
+    if len(conf_notes) > CONFIRMATION_LIMIT:
+        cons.send_message(f"changed {len(conf_notes)} notes")
+        return
 
-        # send confirmations
-        for note in conf_notes:
-            cons.send_confirmation(note, "changed")
+    for note in conf_notes:
+        cons.send_confirmation(note, "changed")
 
 
 change_cmd = Command(("change", "replace"), change_cmd_execute)
@@ -382,7 +620,7 @@ change_cmd = Command(("change", "replace"), change_cmd_execute)
 def version_cmd_execute(_: tuple[str, ...] = ()) -> None:
     """Version command execution function."""
 
-    cons.send_version(metadata.version("sonia"))
+    cons.send_version(sonia.__version__)
 
 
 version_cmd = Command(("version", "v", "-version", "--version"), version_cmd_execute)
@@ -392,33 +630,263 @@ version_cmd = Command(("version", "v", "-version", "--version"), version_cmd_exe
 # use specified database
 
 
-def db_cmd_execute(args: tuple[str, ...]) -> None:
+def db_cmd_execute(args: tuple[str, ...]) -> bool | None:
     """Use specified database command execution function."""
 
     if len(args) < 1:
         cons.send_error("no database argument", "sonia db path/to/database command ...")
-        return
+        return False
+
+    if args[0] == "migrate":
+        return db_migrate(args[1:])
 
     db_path, *rest = args
 
     # set database path
     if not db.set_path(db_path):
         cons.send_error("could not use database path", db_path)
-        return
+        return False
 
     # execute command
-    match rest:
-        case cmd_id, *cargs if cmd_id in commands:
-            commands[cmd_id].run(tuple(cargs))
-        case []:  # no args
-            commands["focus"].run()
-        case unknown, *_:
-            cons.send_error("unknown command", unknown)
+    return dispatch(rest)
+
+
+def db_migrate(args: tuple[str, ...]) -> bool | None:
+    """Copy notes between databases (and storage engines)."""
+
+    if len(args) != 2:
+        cons.send_error(
+            "missing argument(s)", "sonia db migrate path/to/source path/to/target"
+        )
+        return False
+
+    source, target = args
+
+    if not db.set_path(target):
+        cons.send_error("could not use database path", target)
+        return False
+
+    try:
+        count = db.copy_notes(source, target)
+    except FileNotFoundError:
+        cons.send_error("database does not exist", source)
+        return False
+    except db.DatabaseNotEmpty:
+        cons.send_error("target database is not empty", target)
+        return False
+
+    engine = db.engine_for(Path(target).expanduser())
+    cons.send_message(f"copied {count} notes", f"{target} - {engine.name}")
 
 
 db_cmd = Command(("db",), db_cmd_execute)
 
 
+## import and export commands ##################################################
+
+
+def parse_file_options(
+    args: tuple[str, ...],
+) -> tuple[tuple[str, ...], str | None, bool]:
+    """Split note file options (--format name, --keep-ids) from command
+    arguments. Return remaining arguments, format and keep ids flag."""
+
+    rest: list[str] = []
+    format: str | None = None
+    keep_ids = False
+
+    remaining = iter(args)
+    for arg in remaining:
+        if arg == "--format":
+            format = next(remaining, "")
+        elif arg.startswith("--format="):
+            format = arg.removeprefix("--format=")
+        elif arg == "--keep-ids":
+            keep_ids = True
+        else:
+            rest.append(arg)
+
+    return tuple(rest), format, keep_ids
+
+
+def export_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Export notes to file command execution function."""
+
+    match parse_file_options(args):
+        case (path,), format, _:
+            pass
+        case _:
+            cons.send_error(
+                "missing argument",
+                "sonia export path/to/file [--format jsonl|csv|parquet]",
+            )
+            return False
+
+    try:
+        count = db.export_notes(
+            path, format, lambda count: cons.send_progress("exporting", count)
+        )
+    except (OSError, ValueError) as error:
+        cons.end_progress()
+        cons.send_error(str(error), path)
+        return False
+
+    cons.end_progress()
+    cons.send_message(f"exported {count} notes", path)
+
+
+export_cmd = Command(("export",), export_cmd_execute)
+
+
+def import_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Import notes from file command execution function."""
+
+    match parse_file_options(args):
+        case (path,), format, keep_ids:
+            pass
+        case _:
+            cons.send_error(
+                "missing argument",
+                "sonia import path/to/file [--format jsonl|csv|parquet] [--keep-ids]",
+            )
+            return False
+
+    try:
+        count = db.import_notes(
+            path,
+            format,
+            keep_ids,
+            lambda count: cons.send_progress("importing", count),
+        )
+    except FileNotFoundError:
+        cons.send_error("file does not exist", path)
+        return False
+    except (OSError, ValueError, db.DuplicateNote) as error:
+        cons.end_progress()
+        cons.send_error(str(error), path)
+        return False
+
+    cons.end_progress()
+    cons.send_message(f"imported {count} notes", path)
+
+
+import_cmd = Command(("import",), import_cmd_execute)
+
+
+## batch command ###############################################################
+# run command lines from a script or ndjson stream in one process - one
+# database connection, optionally one transaction for the whole batch
+
+
+BATCH_USAGE = "sonia batch [path/to/script | -] [--transaction]"
+
+
+class BatchFailed(Exception):
+    """Batch line failed (rolls back a batch transaction)."""
+
+
+def batch_cmd_execute(args: tuple[str, ...]) -> bool | None:
+    """Run commands from file (or stdin) execution function. One command per
+    line - shell words, or a JSON array of arguments."""
+
+    import sys
+    from contextlib import ExitStack
+
+    single_transaction = "--transaction" in args
+    paths = [arg for arg in args if arg != "--transaction"]
+
+    if len(paths) > 1 or any(path.startswith("--") for path in paths):
+        cons.send_error("invalid batch arguments", BATCH_USAGE)
+        return False
+
+    path = paths[0] if paths else "-"
+
+    with ExitStack() as stack:
+        try:
+            file = sys.stdin if path == "-" else stack.enter_context(open(path))
+        except OSError:
+            cons.send_error("could not read batch file", path)
+            return False
+
+        if not single_transaction:
+            ran, failed = run_batch(file, stop_on_failure=False)
+            cons.send_message(f"batch ran {ran} commands", f"{failed} failed")
+            return failed == 0
+
+        try:
+            with db.transaction(write=True):
+                ran, _ = run_batch(file, stop_on_failure=True)
+        except BatchFailed as failure:
+            cons.send_error("batch rolled back", str(failure))
+            return False
+
+        cons.send_message(f"batch ran {ran} commands", "committed")
+
+
+def run_batch(lines: Iterable[str], stop_on_failure: bool) -> tuple[int, int]:
+    """Run command lines. Return count of commands run and of failed commands.
+    Raise BatchFailed at the first failure if stopping on failure."""
+
+    ran = failed = 0
+
+    for number, line in enumerate(lines, 1):
+        succeeded = True
+
+        try:
+            args = parse_batch_line(line)
+        except ValueError as error:
+            cons.send_error(f"invalid batch line ({error})", line.strip())
+            args, succeeded = [], False
+
+        if args and commands.get(args[0]) in BATCH_EXCLUDED:
+            cons.send_error("not allowed in batch", args[0])
+            succeeded = False
+        elif args:
+            ran += 1
+            try:
+                succeeded = dispatch(args)
+            except Exception as error:
+                # unexpected error fails this line only
+                cons.send_error(
+                    f"command error ({type(error).__name__})",
+                    str(error).partition("\n")[0],
+                )
+                succeeded = False
+
+        if not succeeded:
+            failed += 1
+            cons.send_error(f"batch line {number} failed", line.strip())
+            if stop_on_failure:
+                raise BatchFailed(f"line {number}")
+
+    return ran, failed
+
+
+def parse_batch_line(line: str) -> list[str]:
+    """Return command arguments of batch line: a JSON array of strings (ndjson),
+    or shell words. Blank and comment (#) lines have none. Raise ValueError if
+    malformed."""
+
+    import json
+    import shlex
+
+    line = line.strip()
+
+    if not line or line.startswith("#"):
+        return []
+
+    if line.startswith("["):
+        args = json.loads(line)
+        if not all(isinstance(arg, str) for arg in args):
+            raise ValueError("arguments must be strings")
+        return args
+
+    return shlex.split(line)
+
+
+batch_cmd = Command(("batch",), batch_cmd_execute)
+
+
 ## decide command ##############################################################
 def decide_cmd_execute(_: tuple[str, ...] = ()) -> None:
     """Provide helpful output."""
@@ -432,6 +900,7 @@ def decide_cmd_execute(_: tuple[str, ...] = ()) -> None:
 
 decide_cmd = Command(("decide", "..."), decide_cmd_execute)
 
+
 decisions = (
     ("move forward", "tao"),
     ("the path is open", "tao"),
@@ -491,26 +960,62 @@ decisions = (
 )
 
 
+## serve command ###############################################################
+
+
+def serve_cmd_execute(_: tuple[str, ...] = ()) -> None:
+    """Serve commands from a resident process (keeps the database open)."""
+
+    server.serve()
+
+
+serve_cmd = Command(("serve",), serve_cmd_execute)
+
+
 ## command list - register commands ##
 command_list = [
     add_cmd,
     list_cmd,
     short_list_cmd,
     focus_list_cmd,
+    query_cmd,
     search_cmd,
     update_cmd,
     append_cmd,
     reset_cmd,
     tag_cmd,
     delete_cmd,
+    done_cmd,
+    archive_cmd,
     clear_cmd,
     rebase_cmd,
     change_cmd,
     version_cmd,
     db_cmd,
+    export_cmd,
+    import_cmd,
+    batch_cmd,
     decide_cmd,
+    serve_cmd,
 ]
 
 
 ## build command dictionary ##
 commands: dict[str, Command] = {id: cmd for cmd in command_list for id in cmd.ids}
+
+# commands that cannot run inside a batch (switch databases, nest, block)
+BATCH_EXCLUDED = (batch_cmd, db_cmd, serve_cmd)
+
+
+def dispatch(args: Sequence[str]) -> bool:
+    """Run command identified by first argument with the remaining arguments.
+    Run focus command if no arguments. Return whether the command succeeded."""
+
+    match args:
+        case cmd_id, *cargs if cmd_id in commands:
+            return commands[cmd_id].run(tuple(cargs))
+        case []:  # no args
+            return commands["focus"].run()
+        case _:
+            cons.send_error("unknown command", args[0])
+            return False
@@ -1,15 +1,24 @@
-import sys
+import os
 import re
+import shutil
+import sys
+from collections.abc import Iterable, Sequence
+from functools import cache, lru_cache
 from time import sleep, time
+from typing import TYPE_CHECKING
+
+from sonia import trace
 
-from rich.console import Console
+if TYPE_CHECKING:
+    from rich.console import Console
 
-from sonia import notedb as db
+    from sonia import notedb as db
 
 
 __all__ = [
     "send_version",
     "send_note",
+    "send_notes",
     "send_confirmation",
     "send_error",
     "send_warning",
@@ -18,7 +27,18 @@ __all__ = [
 
 
 ## rich console settings ##
-console = Console()
+# rich is imported on first use - single-line messages (version, errors,
+# warnings) are written directly when the terminal allows it
+
+
+@cache
+def get_console() -> "Console":
+    """Return the rich console. Create it on first use."""
+
+    with trace.span("import rich"):
+        from rich.console import Console
+
+    return Console()
 
 
 # console colors
@@ -34,32 +54,58 @@ CWARN = "#fff670"
 def send_version(version: str) -> None:
     """Output version message using input version string."""
 
-    console.print(f"  [{CDIM}]sonia[/] [{CEMPH}]{version}[/]")
+    print_line(f"  [{CDIM}]sonia[/] [{CEMPH}]{version}[/]")
 
 
-def send_note(note: db.Note) -> None:
-    """Output formatted note."""
+def format_note(note: "db.Note") -> str:
+    """Return console markup line of formatted note."""
 
-    console.print(
+    return (
         f"  [{CDIM2}]{note.date.strftime('%y.%m.%d %H:%M')}[/]"
         + f" [{CSEP}]|[/] "
         + f"[{CDIM}]{note.id:>03}[/]"
         + f" [{CSEP}]|[/] "
-        + f"[{CNORM}]{color_parens(color_tags(note.message))}[/]"
+        + f"[{CNORM}]{color_message(note.message)}[/]"
     )
 
-    sleep(0.016)
+
+def send_note(note: "db.Note") -> None:
+    """Output formatted note."""
+
+    print_lines((format_note(note),), highlight=True)
 
 
-def send_notes(notes: tuple[db.Note, ...], reverse: bool = False) -> None:
-    for note in notes[::-1] if reverse else notes:
-        send_note(note)
+def send_notes(notes: "Iterable[db.Note]", reverse: bool = False) -> None:
+    """Output formatted notes as they arrive, one write per screen of notes
+    (reverse order collects them first). Notes are typed out one at a time
+    when animation is enabled (SONIA_ANIMATE) and output is a terminal."""
 
+    if reverse:
+        notes = tuple(notes)[::-1]
 
-def send_confirmation(note: db.Note, action: str) -> None:
+    if animate_notes():
+        for note in notes:
+            send_note(note)
+            with trace.span("animation"):
+                sleep(ANIMATION_DELAY)
+        return
+
+    batch: list[str] = []
+    size = batch_lines()
+
+    for note in notes:
+        batch.append(format_note(note))
+        if len(batch) == size:
+            print_lines(batch, highlight=True)
+            batch.clear()
+
+    print_lines(batch, highlight=True)
+
+
+def send_confirmation(note: "db.Note", action: str) -> None:
     """Output formatted note confirmation."""
 
-    console.print(
+    get_console().print(
         f"  [{CNORM}]{color_tags(note.message)}[/]"
         + f" [{CSEP}]|[/] "
         + f"[{CDIM}]{note.id}[/]"
@@ -72,27 +118,43 @@ def send_error(error_message: str, arg: str = "") -> None:
     """Output formatted error message."""
 
     if arg == "":
-        console.print(f"  [{CERR}]error[/]: {error_message}")
+        print_line(f"  [{CERR}]error[/]: {error_message}")
     else:
-        console.print(f"  [{CERR}]error[/]: {error_message} ([{CDIM}]{arg}[/])")
+        print_line(f"  [{CERR}]error[/]: {error_message} ([{CDIM}]{arg}[/])")
 
 
 def send_warning(warning_message: str, arg: str = "") -> None:
     """Output formatted warning message."""
 
     if arg == "":
-        console.print(f"  [{CWARN}]warning[/]: {warning_message}")
+        print_line(f"  [{CWARN}]warning[/]: {warning_message}")
     else:
-        console.print(f"  [{CWARN}]warning[/]: {warning_message} ([{CDIM}]{arg}[/])")
+        print_line(f"  [{CWARN}]warning[/]: {warning_message} ([{CDIM}]{arg}[/])")
 
 
 def send_message(message: str, arg: str = "") -> None:
     """Output formatted message."""
 
     if arg == "":
-        console.print(f"  [{CEMPH}]{message}[/{CEMPH}]")
+        print_line(f"  [{CEMPH}]{message}[/{CEMPH}]")
     else:
-        console.print(f"  [{CEMPH}]{message}[/{CEMPH}] ([{CDIM}]{arg}[/])")
+        print_line(f"  [{CEMPH}]{message}[/{CEMPH}] ([{CDIM}]{arg}[/])")
+
+
+def send_progress(message: str, count: int) -> None:
+    """Output progress line (replacing the previous one). Terminals only."""
+
+    if sys.stderr.isatty():
+        sys.stderr.write(f"\r\033[K  {message} {count:,}")
+        sys.stderr.flush()
+
+
+def end_progress() -> None:
+    """Erase progress line."""
+
+    if sys.stderr.isatty():
+        sys.stderr.write("\r\033[K")
+        sys.stderr.flush()
 
 
 def send_consider_pause(duration: float) -> None:
@@ -142,13 +204,172 @@ def send_consider_pause(duration: float) -> None:
     sys.stdout.flush()
 
 
+## message markup ##
+# tags and (ref)s are marked up in one pass - listings repeat the same messages,
+# so marked up messages are cached
+
+MARKUP_CACHE_SIZE = 16_384
+
+TAG = re.compile(r":([a-zA-Z0-9]*):")
+TAG_OR_REF = re.compile(r"(:[a-zA-Z0-9]*:)|\(([0-9a-z]{,3})\)")
+
+
 def color_tags(s: str) -> str:
     """Apply dimming to tags in input string."""
 
-    return re.sub(r":([a-zA-Z0-9]*):", f"[{CDIM}]:\\1:[/{CDIM}]", s)
+    return TAG.sub(f"[{CDIM}]:\\1:[/{CDIM}]", s)
+
+
+@lru_cache(maxsize=MARKUP_CACHE_SIZE)
+def color_message(s: str) -> str:
+    """Apply dimming to tags and emphasis to short references enclosed in
+    parentheses, e.g. (3), in input string."""
+
+    return TAG_OR_REF.sub(_color_tag_or_ref, s)
+
+
+def _color_tag_or_ref(match: re.Match[str]) -> str:
+    tag, ref = match.groups()
+
+    if tag is not None:
+        return f"[{CDIM}]{tag}[/{CDIM}]"
+
+    return f"([{CEMPH}]{ref}[/{CEMPH}])"
+
+
+## screen control ##
+
+ANIMATION_DELAY = 0.016  # seconds per note (typing animation)
+
+PIPE_BATCH_LINES = 1024
+
+CLEAR_SCREEN = "\033[H\033[2J"  # home cursor, erase screen (keep scrollback)
+
+
+def animate_notes() -> bool:
+    """Return whether note lists are typed out (opt-in, terminals only)."""
+
+    return bool(os.environ.get("SONIA_ANIMATE")) and sys.stdout.isatty()
+
+
+def batch_lines() -> int:
+    """Return lines written per batch: one screen on terminals."""
+
+    if not sys.stdout.isatty():
+        return PIPE_BATCH_LINES
+
+    return max(shutil.get_terminal_size().lines, 1)
+
+
+def clear_screen() -> None:
+    """Clear terminal screen. Do nothing if output is not a terminal."""
+
+    if sys.stdout.isatty():
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
+
+
+## direct line output ##
+
+MARKUP_TAG = re.compile(r"(\\*)\[([a-z#/@][^[]*?)]")
+HEX_COLOR = re.compile(r"#([0-9a-fA-F]{2})([0-9a-fA-F]{2})([0-9a-fA-F]{2})")
+
+
+@cache
+def line_color_mode() -> str:
+    """Return how single lines are written: "plain" (no terminal), "truecolor"
+    (24-bit color terminal), or "rich" (leave to rich)."""
+
+    overridden = any(
+        os.environ.get(var) for var in ("FORCE_COLOR", "TTY_COMPATIBLE", "NO_COLOR")
+    )
+
+    if not overridden and not sys.stdout.isatty():
+        return "plain"
+
+    if not overridden and os.environ.get("COLORTERM", "") in ("truecolor", "24bit"):
+        return "truecolor"
+
+    return "rich"
+
+
+def render_line(markup: str, color: bool) -> str | None:
+    """Render color-only console markup as text (with ANSI colors if color).
+    Return None if the markup uses anything beyond colors."""
+
+    parts: list[str] = []
+    colors: list[str] = []
+    position = 0
+
+    for tag in MARKUP_TAG.finditer(markup):
+        backslashes, style = tag.groups()
+
+        parts.append(markup[position : tag.start()])
+        parts.append(backslashes[: len(backslashes) // 2])
+        position = tag.end()
+
+        if len(backslashes) % 2:  # escaped - literal text
+            parts.append(f"[{style}]")
+            continue
+
+        if style.startswith("/"):
+            if colors:
+                colors.pop()
+        elif style == "default" or HEX_COLOR.fullmatch(style):
+            colors.append(style)
+        else:
+            return None  # styles other than colors
+
+        if color:
+            parts.append(ansi_color(colors[-1] if colors else "default"))
+
+    parts.append(markup[position:])
+
+    return "".join(parts)
+
+
+def ansi_color(style: str) -> str:
+    """Return ANSI escape sequence selecting (24-bit) foreground color."""
+
+    if match := HEX_COLOR.fullmatch(style):
+        red, green, blue = (int(component, 16) for component in match.groups())
+        return f"\033[38;2;{red};{green};{blue}m"
+
+    return "\033[39m"  # default
+
+
+def print_line(markup: str) -> None:
+    """Output single line of console markup. Write directly unless rich is needed."""
+
+    print_lines((markup,))
+
+
+def print_lines(lines: Sequence[str], highlight: bool = False) -> None:
+    """Output lines of console markup in one write (or one rich render if any
+    line needs rich). Highlighted lines (rich highlighter) are written directly
+    only without a terminal."""
+
+    if not lines:
+        return
+
+    with trace.span("render"):
+        _print_lines(lines, highlight)
+
 
+def _print_lines(lines: Sequence[str], highlight: bool) -> None:
+    mode = line_color_mode()
+    if highlight and mode == "truecolor":
+        mode = "rich"
 
-def color_parens(s: str) -> str:
-    """Apply dimming to integers enclosed in parentheses in input string."""
+    if mode != "rich":
+        rendered: list[str] = []
+        for markup in lines:
+            if (line := render_line(markup, mode == "truecolor")) is None:
+                break
+            rendered.append(line)
+        else:
+            sys.stdout.write("\n".join(rendered) + "\n")
+            sys.stdout.flush()
+            return
 
-    return re.sub(r"\(([0-9a-z]{,3})\)", f"([{CEMPH}]\\1[/{CEMPH}])", s)
+    get_console().print(*lines, sep="\n")
@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+__all__ = [
+    "lazy_import",
+]
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return named module. Defer loading it until first attribute access."""
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
@@ -1,17 +1,24 @@
 #!/usr/bin/env python
 import sys
-from sonia import console_output as cons
+
 from sonia import commands as cmd
+from sonia import server, trace
 
 
 def main() -> None:
-    match sys.argv:
-        case _, cmd_id, *args if cmd_id in cmd.commands:
-            cmd.commands[cmd_id].run(tuple(args))
-        case [_]:  # no args
-            cmd.commands["focus"].run()
-        case _, unknown, *_:
-            cons.send_error("unknown command", unknown)
+    args = sys.argv[1:]
+
+    # sonia --trace[=path.json] command ... - phase timing (see trace)
+    if args[:1] and args[0].partition("=")[0] == "--trace":
+        trace.enable(args.pop(0).partition("=")[2])
+
+    # run on the resident server (sonia serve) if there is one
+    with trace.span("forward"):
+        forwarded = args[:1] != ["serve"] and server.forward(args)
+
+    if not forwarded:
+        with trace.span("command"):
+            cmd.dispatch(args)
 
 
 if __name__ == "__main__":
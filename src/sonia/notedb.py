@@ -1,27 +1,55 @@
-from collections.abc import Iterable
+import atexit
+import os
+import re
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import NamedTuple
 
-import duckdb
+from sonia import trace
+from sonia.storage import Connection, Engine, engine_for, engines
 
 
 __all__ = [
     "Note",
     "create_notes",
     "is_valid",
+    "missing_ids",
     "get_notes",
     "get_note_matches",
     "get_note_unmatches",
     "get_tag_matches",
     "get_tag_unmatches",
+    "get_tagged_notes",
+    "iter_notes",
+    "iter_tagged_notes",
+    "select_notes",
+    "search_notes",
     "update_note",
+    "append_note",
+    "reset_note",
     "rebase",
     "change",
     "change_all",
     "delete_notes",
     "clear_database",
+    "ArchiveStats",
+    "search_archive",
+    "archive_stats",
     "set_path",
+    "get_connection",
+    "get_engine",
+    "close_connection",
+    "bind_connection",
+    "transaction",
+    "copy_notes",
+    "export_notes",
+    "import_notes",
 ]
 
 
@@ -42,13 +70,59 @@ class DatabaseCorrupted(Exception):
     pass
 
 
+class UnsupportedSchema(Exception):
+    """Database schema newer than this version of sonia exception"""
+
+    pass
+
+
+class DatabaseNotEmpty(Exception):
+    """Database already contains notes exception"""
+
+    pass
+
+
+class DuplicateNote(Exception):
+    """Note identifier already in use exception"""
+
+    pass
+
+
 ## database schema ##
-SCHEMA = "coredb"
 TABLE = "notes"
-NID_COLUMN = "nid"
+NID_COLUMN = "nid"  # stable identifier (internal key)
+DID_COLUMN = "did"  # display identifier (note id shown, renumbered by rebase)
 TIMESTAMP_COLUMN = "date"
 MESSAGE_COLUMN = "message"
 
+TAGS_TABLE = "note_tags"
+TAG_COLUMN = "tag"
+
+TERMS_TABLE = "note_terms"
+TERM_COLUMN = "term"
+COUNT_COLUMN = "count"
+
+# tables derived from note text (keyed by nid)
+INDEX_TABLES = (TAGS_TABLE, TERMS_TABLE)
+
+ARCHIVE_TABLE = "archived_notes"  # completed notes (cold tier, not indexed)
+ARCHIVED_COLUMN = "archived"  # time archived
+ARCHIVE_COLUMNS = (NID_COLUMN, TIMESTAMP_COLUMN, MESSAGE_COLUMN, ARCHIVED_COLUMN)
+
+META_TABLE = "meta"
+META_KEY_COLUMN = "key"
+META_VALUE_COLUMN = "value"
+
+COPY_BATCH_SIZE = 10_000
+FETCH_SIZE = 500  # rows read at a time by note iterators
+
+# note tags - :word: (matches console tag coloring)
+TAG_PATTERN = re.compile(r"(?=:([a-zA-Z0-9]+):)")
+
+# search terms - words, stemmed
+TERM_PATTERN = re.compile(r"[^\W_]+")
+BM25_K1 = 1.2  # term frequency saturation
+
 
 ## database path ##
 db_path: Path = Path.home() / ".sonia.db"
@@ -60,326 +134,1488 @@ def set_path(string_path: str) -> bool:
     if not Path(string_path).parent.exists():
         return False
 
+    if Path(string_path) != db_path:
+        close_connection()  # connection belongs to the previous database
+
     db_path = Path(string_path)
 
     return True
 
 
-## module functions ##
+## database connection ##
+# one connection per process - opened (and bootstrapped) on first use, shared
+# by all module functions, and closed at interpreter exit. threads may bind
+# their own connection instead (async note store workers)
+
+_connection: Connection | None = None
+_engine: Engine = engines["duckdb"]
+
+_thread = threading.local()
+
+
+def get_connection() -> Connection:
+    """Return the note database connection of the current thread: the bound
+    connection, or else the shared connection. Open it on first use."""
+
+    global _connection, _engine
+
+    if (con := getattr(_thread, "connection", None)) is not None:
+        return con
 
+    if _connection is None:
+        with trace.span("open database"):
+            _engine = engine_for(db_path.expanduser())
+            _connection = open_connection(db_path, _engine)
+
+    return _connection
+
+
+def get_engine() -> Engine:
+    """Return the storage engine of the current thread's database connection."""
+
+    if getattr(_thread, "connection", None) is not None:
+        return _thread.engine
+
+    get_connection()
+
+    return _engine
+
+
+def bind_connection(
+    con: Connection | None, engine: Engine | None = None, path: Path | None = None
+) -> None:
+    """Use connection (of storage engine, to database path) for module functions
+    called from the current thread. Unbind with None (back to the shared
+    connection)."""
+
+    _thread.connection = con
+    _thread.engine = engine
+    _thread.path = path
+
+
+def get_path() -> Path:
+    """Return path of the current thread's database (bound or shared)."""
+
+    if getattr(_thread, "connection", None) is not None and _thread.path is not None:
+        return _thread.path
+
+    return db_path.expanduser()
+
+
+def close_connection() -> None:
+    """Close the shared note database connection (if open)."""
+
+    global _connection
+
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+atexit.register(close_connection)
+
+
+# write transactions of this process run one at a time - display identifiers
+# are assigned from the notes a write transaction reads (see next_display_id)
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def transaction(write: bool = False) -> Generator[Connection, None, None]:
+    """Run enclosed statements as one transaction on the shared connection.
+    Transactions opened inside a transaction join it (commit with it). Write
+    transactions hold the write lock, bump the write generation before and after
+    they run, and refresh the completion index when they commit. Raise
+    DuplicateNote if a write violates a unique constraint."""
+
+    con = get_connection()
+
+    if in_transaction(con):
+        if write and not _thread.writes:
+            bump_generation()
+            _thread.writes = True
+        yield con
+        return
+
+    with _write_lock if write else nullcontext():
+        if write:
+            bump_generation()
+
+        con.execute(get_engine().begin_write if write else "begin;")
+        _thread.transaction = con
+        _thread.writes = write
+        try:
+            yield con
+        except get_engine().constraint_errors() as error:
+            con.execute("rollback;")
+            raise DuplicateNote("note identifier already in use") from error
+        except BaseException:
+            con.execute("rollback;")
+            raise
+        else:
+            con.execute("commit;")
+            if _thread.writes:
+                write_completion_index(con, get_engine())
+        finally:
+            _thread.transaction = None
+            if _thread.writes:
+                bump_generation()
 
-def get_connection() -> duckdb.DuckDBPyConnection:
-    """Return the note database connection."""
+
+def in_transaction(con: Connection) -> bool:
+    """Return whether the current thread runs a transaction on connection."""
+
+    return getattr(_thread, "transaction", None) is con
+
+
+def open_connection(path: Path, engine: Engine | None = None) -> Connection:
+    """Open note database connection. Upgrade the schema if it is out of date.
+    The storage engine is chosen from the database file unless provided."""
+
+    path = Path(path).expanduser()
+    engine = engine or engine_for(path)
 
     # connect to database (or create if it doesn't exist)
-    con = duckdb.connect(Path(db_path).expanduser())
+    con = engine.connect(path)
+
+    with trace.span("bootstrap"):
+        version = get_schema_version(con, engine)
+
+        if version > SCHEMA_VERSION:
+            con.close()
+            raise UnsupportedSchema(
+                f"database schema version {version} is newer than {SCHEMA_VERSION}"
+            )
+
+        if version < SCHEMA_VERSION:
+            migrate(con, engine, version)
+
+        engine.use_schema(con)
+
+    return con
+
+
+## write generation ##
+# every write transaction changes the database's write generation - a token in
+# a sidecar directory next to the database (readable without opening it).
+# caches of note views are valid for one generation. the generation changes
+# before a write (readers racing it cache under a stale token) and after it
+# (commit or rollback)
+
+SIDECAR_SUFFIX = ".cache"
+GENERATION_FILE = "generation"
+
+
+def sidecar_path(path: Path | None = None) -> Path:
+    """Return sidecar directory of database (the current database if none)."""
+
+    path = path or get_path()
+
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+def get_generation(path: Path | None = None) -> str:
+    """Return write generation of database ("" if never written)."""
+
+    try:
+        return (sidecar_path(path) / GENERATION_FILE).read_text()
+    except OSError:
+        return ""
+
+
+def bump_generation(path: Path | None = None) -> None:
+    """Change write generation of database (invalidating cached views)."""
+
+    directory = sidecar_path(path)
+
+    try:
+        directory.mkdir(exist_ok=True)
+
+        # atomic replace - readers see the old or the new generation
+        temporary = directory / f"{GENERATION_FILE}.{os.getpid()}"
+        temporary.write_text(f"{time.time_ns()}-{os.getpid()}")
+        os.replace(temporary, directory / GENERATION_FILE)
+    except OSError:
+        pass  # read-only location - views are not cached (see store_view)
+
+
+## completion index ##
+# tags and the note id range of the database, written to the sidecar directory
+# after every write - shell completion (tools/completions.py) reads them
+# without opening the database. the queries stay cheap at any database size
+# (a few milliseconds at 200k notes)
 
-    con.begin()  # start transaction
+COMPLETION_FILE = "completion"
 
-    # create schema and notes table
-    con.execute(f"create schema if not exists {SCHEMA};")
-    con.execute(f"set schema = {SCHEMA};")
-    con.execute("create sequence if not exists nid_sequence start 1;")
+
+def write_completion_index(
+    con: Connection, engine: Engine, path: Path | None = None
+) -> None:
+    """Write completion index of database (the current database if none) - a
+    line of tags and a line of note id ranges (first-last, or a single id)."""
+
+    tags = con.execute(engine.distinct_query(TAGS_TABLE, TAG_COLUMN)).fetchall()
+    first, last, count = con.execute(f"""
+        select
+            (select min({DID_COLUMN}) from {TABLE}),
+            (select max({DID_COLUMN}) from {TABLE}),
+            (select count(*) from {TABLE});
+    """).fetchone()
+
+    # done and removed notes leave gaps until rebase - looked up only if the ids
+    # do not fill their range
+    gaps = (
+        con.execute(engine.gaps_query(TABLE, DID_COLUMN)).fetchall()
+        if count and last - first + 1 != count
+        else []
+    )
+    starts = (first, *(after for _, after in gaps))
+    ends = (*(before for before, _ in gaps), last)
+    ids = (
+        str(start) if start == end else f"{start}-{end}"
+        for start, end in zip(starts, ends, strict=True)
+        if start is not None  # no notes
+    )
+
+    directory = sidecar_path(path)
+    index = (
+        " ".join(("tags", *(tag for (tag,) in tags))),
+        " ".join(("ids", *ids)),
+    )
+
+    try:
+        directory.mkdir(exist_ok=True)
+
+        temporary = directory / f"{COMPLETION_FILE}.{os.getpid()}"
+        temporary.write_text("\n".join(index) + "\n")
+        os.replace(temporary, directory / COMPLETION_FILE)
+    except OSError:
+        pass  # read-only location - nothing to complete from
+
+
+## schema migrations ##
+# ordered schema steps - a database at version n has had the first n steps
+# applied. append new steps to the end; never edit or reorder existing ones.
+
+type Migration = Callable[[Connection, Engine], None]
+
+
+def _notes_table(con: Connection, engine: Engine) -> None:
+    """1 - notes table (statements tolerate pre-migration databases)"""
+
+    for statement in engine.sequence_statements():
+        con.execute(statement)
+
+    # nids are drawn from the sequence on insert (not as a column default) so
+    # the sequence can be replaced on the connection that created it
     con.execute(f"""
         create table if not exists {TABLE} (
-            {NID_COLUMN} integer primary key default nextval('nid_sequence'),
+            {NID_COLUMN} {engine.nid_type},
             {TIMESTAMP_COLUMN} timestamp,
             {MESSAGE_COLUMN} varchar
         );
     """)
 
-    con.commit()  # end transaction
 
-    return con
+def _tags_table(con: Connection, engine: Engine) -> None:
+    """2 - tag index (one row per note tag), filled from existing notes"""
 
+    con.execute(f"""
+        create table {TAGS_TABLE} (
+            {NID_COLUMN} integer,
+            {TAG_COLUMN} varchar
+        );
+    """)
+    con.execute(
+        f"create index {TAGS_TABLE}_{TAG_COLUMN} on {TAGS_TABLE}"
+        + f" ({TAG_COLUMN}, {NID_COLUMN});"
+    )
+    con.execute(
+        f"create index {TAGS_TABLE}_{NID_COLUMN} on {TAGS_TABLE} ({NID_COLUMN});"
+    )
 
-def get_notes(ids: tuple[int, ...] = ()) -> tuple[Note, ...]:
-    """Return identified notes. Return all if none identified."""
+    notes = con.execute(f"select {NID_COLUMN}, {MESSAGE_COLUMN} from {TABLE};")
+    index_tags(con, engine, notes.fetchall())
 
-    rows: list[tuple[int, datetime, str]]
 
-    with get_connection() as con:
-        if not ids:
-            # retrieve all notes
-            query = f"""
-            select
-                {NID_COLUMN},
-                {TIMESTAMP_COLUMN},
-                {MESSAGE_COLUMN}
-            from
-                {TABLE}
-            order by
-                1;
-            """
+def _terms_table(con: Connection, engine: Engine) -> None:
+    """3 - search term index (one row per note term), filled from existing notes"""
 
-            rows = con.execute(query).fetchall()
-        else:
-            # retrieve selected nids
-            query = f"""
+    con.execute(f"""
+        create table {TERMS_TABLE} (
+            {NID_COLUMN} integer,
+            {TERM_COLUMN} varchar,
+            {COUNT_COLUMN} integer
+        );
+    """)
+    con.execute(
+        f"create index {TERMS_TABLE}_{TERM_COLUMN} on {TERMS_TABLE}"
+        + f" ({TERM_COLUMN}, {NID_COLUMN});"
+    )
+    con.execute(
+        f"create index {TERMS_TABLE}_{NID_COLUMN} on {TERMS_TABLE} ({NID_COLUMN});"
+    )
+
+    notes = con.execute(f"select {NID_COLUMN}, {MESSAGE_COLUMN} from {TABLE};")
+    index_terms(con, engine, notes.fetchall())
+
+
+def _display_ids(con: Connection, engine: Engine) -> None:
+    """4 - display identifiers, starting out equal to the stable nids"""
+
+    con.execute(f"alter table {TABLE} add column {DID_COLUMN} integer;")
+    con.execute(f"update {TABLE} set {DID_COLUMN} = {NID_COLUMN};")
+
+    for statement in engine.updated_index_statements(TABLE, DID_COLUMN):
+        con.execute(statement)
+
+
+def _archive_table(con: Connection, engine: Engine) -> None:
+    """5 - archive of completed notes"""
+
+    con.execute(f"""
+        create table {ARCHIVE_TABLE} (
+            {NID_COLUMN} integer,
+            {TIMESTAMP_COLUMN} timestamp,
+            {MESSAGE_COLUMN} varchar,
+            {ARCHIVED_COLUMN} timestamp
+        );
+    """)
+
+
+def _date_index(con: Connection, engine: Engine) -> None:
+    """6 - note date index (time range filters)"""
+
+    for statement in engine.updated_index_statements(TABLE, TIMESTAMP_COLUMN):
+        con.execute(statement)
+
+
+def _renumber_duplicate_display_ids(con: Connection, engine: Engine) -> None:
+    """7 - notes sharing a display identifier (written by concurrent writers) are
+    renumbered after the newest note"""
+
+    (did_max,) = con.execute(
+        f"select coalesce(max({DID_COLUMN}), 0) from {TABLE};"
+    ).fetchone()
+
+    con.execute(
+        f"""
+        with duplicates as (
             select
                 {NID_COLUMN},
-                {TIMESTAMP_COLUMN},
-                {MESSAGE_COLUMN}
-            from
-                {TABLE}
+                row_number() over(order by {DID_COLUMN}, {NID_COLUMN}) as n
+            from (
+                select
+                    {NID_COLUMN},
+                    {DID_COLUMN},
+                    row_number() over(
+                        partition by {DID_COLUMN} order by {NID_COLUMN}
+                    ) as copy
+                from
+                    {TABLE}
+            )
             where
-                {NID_COLUMN} in ({generate_query_insert(ids)})
-            order by
-                1;
-            """
+                copy > 1
+        )
+
+        update
+            {TABLE} as n
+        set
+            {DID_COLUMN} = ? + d.n
+        from
+            duplicates d
+        where
+            n.{NID_COLUMN} = d.{NID_COLUMN};
+        """,
+        [did_max],
+    )
 
-            rows = con.execute(query, ids).fetchall()
 
-    # covert each row into a Note
-    notes = tuple(Note(*row) for row in rows)
+def _unique_display_ids(con: Connection, engine: Engine) -> None:
+    """8 - unique display identifier index (engine dependent), once renumbered
+    duplicates have committed"""
 
-    return notes
+    for statement in engine.unique_index_statements(TABLE, DID_COLUMN):
+        con.execute(statement)
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    _notes_table,
+    _tags_table,
+    _terms_table,
+    _display_ids,
+    _archive_table,
+    _date_index,
+    _renumber_duplicate_display_ids,
+    _unique_display_ids,
+)
 
+SCHEMA_VERSION = len(MIGRATIONS)
 
-def delete_notes(ids: tuple[int, ...]) -> tuple[Note, ...]:
-    """Delete identified notes."""
 
-    rows: list[tuple[int, datetime, str]]
+def get_schema_version(con: Connection, engine: Engine) -> int:
+    """Return schema version of connected database (0 if never migrated)."""
 
     query = f"""
-    delete from {TABLE}
-    where {NID_COLUMN} in ({generate_query_insert(ids)})
-    returning *;
+    select
+        {META_VALUE_COLUMN}
+    from
+        {engine.qualify(META_TABLE)}
+    where
+        {META_KEY_COLUMN} = 'schema_version';
     """
 
-    with get_connection() as con:
-        rows = con.execute(query, ids).fetchall()
+    try:
+        row = con.execute(query).fetchone()
+    except engine.missing_table_errors():
+        return 0  # no metadata table
 
-    # covert each row into a Note
-    notes = tuple(Note(*row) for row in rows)
+    return 0 if row is None else row[0]
 
-    return notes
 
+def migrate(con: Connection, engine: Engine, version: int) -> None:
+    """Apply migration steps after provided version, each in its own
+    transaction with the schema version it reaches (duckdb cannot create an
+    index in a transaction that updated rows)."""
 
-def clear_database() -> None:
-    """Delete all notes from note database."""
+    for statement in engine.schema_statements():
+        con.execute(statement)
 
-    with get_connection() as con:
-        con.begin()
-        con.execute(f"delete from {TABLE};")
-        con.execute("create or replace sequence nid_sequence start 1")  # reset sequence
-        con.commit()
+    con.execute(f"""
+        create table if not exists {META_TABLE} (
+            {META_KEY_COLUMN} varchar primary key,
+            {META_VALUE_COLUMN} bigint
+        );
+    """)
 
+    for step_version, step in enumerate(MIGRATIONS[version:], version + 1):
+        con.execute("begin;")
+        try:
+            step(con, engine)
 
-def get_note_matches(match: str) -> tuple[Note, ...]:
-    """Return all notes that have text matching input."""
+            con.execute(
+                f"insert or replace into {META_TABLE} values ('schema_version', ?);",
+                [step_version],
+            )
+        except BaseException:
+            con.execute("rollback;")
+            raise
+        con.execute("commit;")
 
-    query = f"""
+
+## engine migration ##
+
+
+def copy_notes(source: str, target: str) -> int:
+    """Copy all notes (and archived notes) from source database into empty
+    target database, keeping note identifiers and timestamps. Return number of
+    notes copied. The storage engine of each database is chosen from its
+    file."""
+
+    if not Path(source).expanduser().exists():
+        raise FileNotFoundError(source)
+
+    source_con = open_connection(Path(source))
+    target_engine = engine_for(Path(target).expanduser())
+    target_con = open_connection(Path(target), target_engine)
+
+    select_query = f"""
     select
         {NID_COLUMN},
+        {DID_COLUMN},
         {TIMESTAMP_COLUMN},
         {MESSAGE_COLUMN}
     from
         {TABLE}
-    where
-        {MESSAGE_COLUMN} ilike ?
     order by
         1;
     """
+    archive_query = f"select {', '.join(ARCHIVE_COLUMNS)} from {ARCHIVE_TABLE};"
+
+    count = 0
+    nid_next = 1
+
+    try:
+        (target_count,) = target_con.execute(
+            f"select count(*) from {TABLE};"
+        ).fetchone()
+        if target_count > 0:
+            raise DatabaseNotEmpty(f"{target} already contains notes")
+
+        bump_generation(Path(target).expanduser())
+        target_con.execute("begin;")
+        try:
+            cursor = source_con.execute(select_query)
+            while rows := cursor.fetchmany(COPY_BATCH_SIZE):
+                insert_rows(
+                    target_con,
+                    target_engine,
+                    TABLE,
+                    (NID_COLUMN, DID_COLUMN, TIMESTAMP_COLUMN, MESSAGE_COLUMN),
+                    ("integer", "integer", "timestamp", "varchar"),
+                    rows,
+                )
+                index_notes(
+                    target_con,
+                    target_engine,
+                    ((nid, message) for nid, _, _, message in rows),
+                )
+                count += len(rows)
+                nid_next = rows[-1][0] + 1
+
+            cursor = source_con.execute(archive_query)
+            while rows := cursor.fetchmany(COPY_BATCH_SIZE):
+                insert_rows(
+                    target_con,
+                    target_engine,
+                    ARCHIVE_TABLE,
+                    ARCHIVE_COLUMNS,
+                    ("integer", "timestamp", "varchar", "timestamp"),
+                    rows,
+                )
+                # archived notes keep their nids - new notes draw past them
+                nid_next = max(nid_next, *(nid + 1 for nid, *_ in rows))
+
+            for statement in target_engine.reset_sequence_statements(TABLE, nid_next):
+                target_con.execute(statement)
+        except BaseException:
+            target_con.execute("rollback;")
+            raise
+        target_con.execute("commit;")
+        write_completion_index(target_con, target_engine, Path(target).expanduser())
+    finally:
+        source_con.close()
+        target_con.close()
+        bump_generation(Path(target).expanduser())
+
+    return count
+
+
+## import and export ##
+# note files are read and written by duckdb (json, csv and parquet support
+# built in), streaming rows in batches
+
+NOTE_FILE_FORMATS = ("jsonl", "csv", "parquet")
+
+NOTE_FILE_SUFFIXES = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+# duckdb copy options and table functions (file path parameter)
+COPY_OPTIONS = {
+    "jsonl": "(format json)",
+    "csv": "(format csv, header)",
+    "parquet": "(format parquet)",
+}
+FILE_READERS = {
+    "jsonl": "read_json(?, format = 'newline_delimited')",
+    "csv": "read_csv(?, header = true)",
+    "parquet": "read_parquet(?)",
+}
+
+
+def note_file_format(path: Path, format: str | None = None) -> str:
+    """Return note file format - provided, or else chosen from file suffix."""
+
+    format = format or NOTE_FILE_SUFFIXES.get(path.suffix.lower())
+
+    if format not in NOTE_FILE_FORMATS:
+        raise ValueError(f"unknown note file format ({format or path.suffix})")
+
+    return format
+
+
+@contextmanager
+def note_file_errors() -> Generator[None, None, None]:
+    """Raise duckdb errors reading or writing a note file as OSError (file
+    cannot be opened) or ValueError (malformed file)."""
+
+    duckdb_engine = engines["duckdb"]
+
+    try:
+        yield
+    except duckdb_engine.io_errors() as error:
+        raise OSError(str(error).splitlines()[0]) from error
+    except duckdb_engine.invalid_input_errors() as error:
+        raise ValueError(str(error).splitlines()[0]) from error
+
+
+def export_notes(
+    path: str,
+    format: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write all notes (nid, date, message) to file in nid order. Return number
+    of notes written. Progress is called with the running count. Files hold
+    display identifiers (note ids as shown) as nids."""
+
+    file_path = Path(path).expanduser()
+    format = note_file_format(file_path, format)
+
+    select_query = f"""
+    select
+        {DID_COLUMN} as {NID_COLUMN},
+        {TIMESTAMP_COLUMN},
+        {MESSAGE_COLUMN}
+    from
+        {TABLE}
+    order by
+        1
+    """
+
+    with note_file_errors():
+        if get_engine().copies_files:
+            # database writes file itself
+            (count,) = (
+                get_connection()
+                .execute(
+                    f"copy ({select_query}) to ? {COPY_OPTIONS[format]};",
+                    [str(file_path)],
+                )
+                .fetchone()
+            )
+        else:
+            count = write_note_file(file_path, format, select_notes(), progress)
+
+    if progress is not None:
+        progress(count)
+
+    return count
+
+
+def write_note_file(
+    path: Path,
+    format: str,
+    notes: Iterable[Note],
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write notes to file. Return number of notes written."""
+
+    import csv
+    import json
+
+    if format == "parquet":
+        return stage_note_file(path, notes, progress)
+
+    count = 0
+
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+
+        if format == "csv":
+            writer.writerow((NID_COLUMN, TIMESTAMP_COLUMN, MESSAGE_COLUMN))
+
+        for note in notes:
+            if format == "csv":
+                writer.writerow((note.id, note.date, note.message))
+            else:
+                row = {
+                    NID_COLUMN: note.id,
+                    TIMESTAMP_COLUMN: str(note.date),
+                    MESSAGE_COLUMN: note.message,
+                }
+                file.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+            count += 1
+            if progress is not None and count % COPY_BATCH_SIZE == 0:
+                progress(count)
+
+    return count
+
+
+def stage_note_file(
+    path: Path,
+    notes: Iterable[Note],
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write notes to parquet file through a staging duckdb database (in a
+    temporary file, so memory use stays flat). Return number of notes written."""
+
+    import tempfile
+
+    stage_engine = engines["duckdb"]
+    count = 0
+
+    with tempfile.TemporaryDirectory() as stage_directory:
+        stage = stage_engine.connect(Path(stage_directory) / "stage.db")
+
+        try:
+            stage.execute(f"""
+                create table {TABLE} (
+                    {NID_COLUMN} integer,
+                    {TIMESTAMP_COLUMN} timestamp,
+                    {MESSAGE_COLUMN} varchar
+                );
+            """)
+
+            remaining = iter(notes)
+            batches = iter(lambda: list(islice(remaining, COPY_BATCH_SIZE)), [])
+            for rows in batches:
+                insert_rows(
+                    stage,
+                    stage_engine,
+                    TABLE,
+                    (NID_COLUMN, TIMESTAMP_COLUMN, MESSAGE_COLUMN),
+                    ("integer", "timestamp", "varchar"),
+                    rows,
+                )
+                count += len(rows)
+                if progress is not None:
+                    progress(count)
+
+            stage.execute(f"copy {TABLE} to ? {COPY_OPTIONS['parquet']};", [str(path)])
+        finally:
+            stage.close()
+
+    return count
+
+
+def import_notes(
+    path: str,
+    format: str | None = None,
+    keep_ids: bool = False,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Add notes from file in one transaction. Return number of notes added.
+    The file needs a message column; dates default to now. Notes are numbered
+    after existing notes (in file nid order when present), or keep their file
+    nids (as display identifiers) if keep_ids. Progress is called with the
+    running count."""
+
+    file_path = Path(path).expanduser()
+    format = note_file_format(file_path, format)
+
+    if not file_path.exists():
+        raise FileNotFoundError(path)
+
+    import duckdb  # deferred - large import
+
+    # separate (in-memory) reader - file rows stream while notes are inserted
+    reader = duckdb.connect()
+    source = FILE_READERS[format]
+    engine = get_engine()
+    count = 0
+
+    try:
+        with note_file_errors():
+            columns = {
+                name
+                for name, *_ in reader.execute(
+                    f"describe select * from {source};", [str(file_path)]
+                ).fetchall()
+            }
+
+            if MESSAGE_COLUMN not in columns:
+                raise ValueError(f"{path} has no {MESSAGE_COLUMN} column")
+
+            if keep_ids and NID_COLUMN not in columns:
+                raise ValueError(f"{path} has no {NID_COLUMN} column")
+
+            nid = f"cast({NID_COLUMN} as integer)" if NID_COLUMN in columns else "null"
+            date = (
+                f"cast({TIMESTAMP_COLUMN} as timestamp)"
+                if TIMESTAMP_COLUMN in columns
+                else "null"
+            )
+
+            select_query = f"""
+            select
+                {nid},
+                coalesce({date}, cast(? as timestamp)),
+                cast({MESSAGE_COLUMN} as varchar)
+            from
+                {source}
+            where
+                {MESSAGE_COLUMN} is not null
+            {"order by 1" if nid != "null" and not keep_ids else ""};
+            """
 
-    with get_connection() as con:
-        matches = con.execute(query, ["%" + match + "%"]).fetchall()
+            with transaction(write=True) as con:
+                (timestamp,) = con.execute(f"select {engine.now};").fetchone()
+                did_next = next_display_id(con)
 
-    # covert each match row into a Note
-    notes = tuple(Note(*row) for row in matches)
+                cursor = reader.execute(select_query, [timestamp, str(file_path)])
+                while rows := cursor.fetchmany(COPY_BATCH_SIZE):
+                    if not keep_ids:
+                        # number after existing notes, in row order
+                        rows = [
+                            (did_next + count + i, date, message)
+                            for i, (_, date, message) in enumerate(rows)
+                        ]
 
-    return notes
+                    try:
+                        inserted = insert_notes(con, engine, rows)
+                    except engine.constraint_errors() as error:
+                        raise DuplicateNote("note identifier already in use") from error
 
+                    index_notes(
+                        con,
+                        engine,
+                        ((nid, message) for nid, _, _, message in inserted),
+                    )
 
-def get_note_unmatches(unmatch: str) -> tuple[Note, ...]:
-    """Return all notes that do not have text matching input."""
+                    count += len(rows)
+                    if progress is not None:
+                        progress(count)
+
+                # display identifiers are not unique indexed on every engine
+                if keep_ids and has_duplicate_display_ids(con):
+                    raise DuplicateNote("note identifier already in use")
+    finally:
+        reader.close()
+
+    return count
+
+
+## display identifiers ##
+# notes are shown and addressed by display identifiers (did): dense, small, and
+# renumbered by rebase. stable nids key the note indexes and never change, so
+# renumbering only rewrites the display identifiers that move
+
+
+def insert_notes(
+    con: Connection, engine: Engine, rows: Sequence[tuple[int, datetime, str]]
+) -> list[tuple[int, int, datetime, str]]:
+    """Insert (did, date, message) rows as new notes, drawing stable nids. Return
+    (nid, did, date, message) rows of inserted notes."""
+
+    inserted: list[tuple[int, int, datetime, str]] = []
+
+    for start in range(0, len(rows), engine.batch_size):
+        batch = rows[start : start + engine.batch_size]
+
+        # one statement per batch - nids are drawn in row order
+        query = f"""
+        insert into {TABLE}
+            ({NID_COLUMN}, {DID_COLUMN}, {TIMESTAMP_COLUMN}, {MESSAGE_COLUMN})
+        select
+            {engine.next_nid},
+            v0,
+            v1,
+            v2
+        from
+            ({engine.rows_query(("integer", "timestamp", "varchar"), len(batch))})
+        returning
+            {NID_COLUMN},
+            {DID_COLUMN},
+            {TIMESTAMP_COLUMN},
+            {MESSAGE_COLUMN};
+        """
+
+        inserted += con.execute(query, engine.rows_params(batch)).fetchall()
+
+    return inserted
+
+
+def next_display_id(con: Connection) -> int:
+    """Return display identifier following the existing notes."""
+
+    (did_next,) = con.execute(
+        f"select coalesce(max({DID_COLUMN}), 0) + 1 from {TABLE};"
+    ).fetchone()
+
+    return did_next
+
+
+def has_duplicate_display_ids(con: Connection) -> bool:
+    """Return whether notes share a display identifier."""
 
     query = f"""
     select
-        {NID_COLUMN},
+        {DID_COLUMN}
+    from
+        {TABLE}
+    group by
+        {DID_COLUMN}
+    having
+        count(*) > 1
+    limit 1;
+    """
+
+    return con.execute(query).fetchone() is not None
+
+
+## module functions ##
+
+
+def get_notes(ids: tuple[int, ...] = ()) -> tuple[Note, ...]:
+    """Return identified notes. Return all if none identified."""
+
+    return tuple(iter_notes(ids))
+
+
+def iter_notes(
+    ids: tuple[int, ...] = (),
+    descending: bool = False,
+    before: int | None = None,
+    limit: int | None = None,
+) -> Iterator[Note]:
+    """Yield identified notes (all if none identified) in nid order. Optionally
+    only notes before a nid and only the first limit notes."""
+
+    if not ids:
+        return select_notes(descending=descending, before=before, limit=limit)
+
+    return select_notes(
+        f"{DID_COLUMN} in ({generate_query_insert(ids)})",
+        ids,
+        descending=descending,
+        before=before,
+        limit=limit,
+    )
+
+
+def select_notes(
+    condition: str = f"{NID_COLUMN} is not null",
+    params: Sequence[object] = (),
+    descending: bool = False,
+    before: int | None = None,
+    limit: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Iterator[Note]:
+    """Yield notes matching parameterized condition in nid order, reading rows
+    in chunks. Optionally only notes before a nid (keyset pagination), only
+    notes dated since and until (exclusive) a time, and only the first limit
+    notes."""
+
+    # the default condition is not "true" - duckdb drops rows from unfiltered
+    # ordered limit queries on tables with stale row group statistics (seen in
+    # databases with deleted rows written by older versions)
+
+    params = list(params)
+
+    if before is not None:
+        condition = f"({condition}) and {DID_COLUMN} < ?"
+        params.append(before)
+
+    # date bounded lists read the date index - "+" keeps sqlite from scanning
+    # the display id index in order instead (whole table for recent dates)
+    order = DID_COLUMN
+
+    for bound in date_bounds(since, until):
+        condition = f"({condition}) and {bound}"
+        order = f"+{DID_COLUMN}"
+    params += [date for date in (since, until) if date is not None]
+
+    query = f"""
+    select
+        {DID_COLUMN},
         {TIMESTAMP_COLUMN},
         {MESSAGE_COLUMN}
     from
         {TABLE}
     where
-        {MESSAGE_COLUMN} not ilike ?
+        {condition}
     order by
-        1;
+        {order} {"desc" if descending else "asc"}
+    {"" if limit is None else f"limit {int(limit)}"};
     """
 
-    with get_connection() as con:
-        unmatches = con.execute(query, ["%" + unmatch + "%"]).fetchall()
+    # own cursor - rows stay readable while other statements run. inside a
+    # transaction read on the connection itself (sees uncommitted changes)
+    con = get_connection()
+    shared = in_transaction(con)
+    cursor = con if shared else get_engine().cursor(con)
 
-    # covert each unmatch row into a Note
-    notes = tuple(Note(*row) for row in unmatches)
+    try:
+        with trace.span("query"):
+            result = cursor.execute(query, params)
 
-    return notes
+        while True:
+            with trace.span("fetch"):
+                rows = result.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
 
+            # covert each row into a Note
+            with trace.span("notes"):
+                notes = [Note(*row) for row in rows]
 
-def get_tag_matches(tag: str) -> tuple[Note, ...]:
-    """Return all notes that have tags matching input."""
+            yield from notes
+    finally:
+        if not shared:
+            cursor.close()
+
+
+def date_bounds(since: datetime | None, until: datetime | None) -> list[str]:
+    """Return parameterized conditions bounding note dates (since, until -
+    parameters in that order, where given)."""
+
+    bounds = []
+
+    if since is not None:
+        bounds.append(f"{TIMESTAMP_COLUMN} >= ?")
+    if until is not None:
+        bounds.append(f"{TIMESTAMP_COLUMN} < ?")
+
+    return bounds
+
+
+def delete_notes(ids: tuple[int, ...], archive: bool = False) -> tuple[Note, ...]:
+    """Delete identified notes, moving them to the archive if archive. Return
+    deleted notes."""
+
+    rows: list[tuple[int, int, datetime, str]]
 
     query = f"""
-    select
+    delete from {TABLE}
+    where {DID_COLUMN} in ({generate_query_insert(ids)})
+    returning
         {NID_COLUMN},
+        {DID_COLUMN},
         {TIMESTAMP_COLUMN},
-        {MESSAGE_COLUMN}
+        {MESSAGE_COLUMN};
+    """
+
+    engine = get_engine()
+
+    with transaction(write=True) as con:
+        rows = con.execute(query, ids).fetchall()
+        unindex_notes(con, engine, (nid for nid, *_ in rows))
+
+        if archive:
+            (timestamp,) = con.execute(f"select {engine.now};").fetchone()
+            insert_rows(
+                con,
+                engine,
+                ARCHIVE_TABLE,
+                ARCHIVE_COLUMNS,
+                ("integer", "timestamp", "varchar", "timestamp"),
+                [(nid, date, message, timestamp) for nid, _, date, message in rows],
+            )
+
+    # covert each row into a Note (in nid order)
+    notes = tuple(Note(*row[1:]) for row in sorted(rows, key=lambda row: row[1]))
+
+    return notes
+
+
+def clear_database() -> None:
+    """Delete all notes from note database."""
+
+    with transaction(write=True) as con:
+        con.execute(f"delete from {TABLE};")
+        for table in (*INDEX_TABLES, ARCHIVE_TABLE):
+            con.execute(f"delete from {table};")
+
+        # reset sequence
+        for statement in get_engine().reset_sequence_statements(TABLE, 1):
+            con.execute(statement)
+
+
+def get_note_matches(match: str) -> tuple[Note, ...]:
+    """Return all notes that have text matching input."""
+
+    return tuple(
+        select_notes(f"{MESSAGE_COLUMN} {get_engine().ilike} ?", ["%" + match + "%"])
+    )
+
+
+def get_note_unmatches(unmatch: str) -> tuple[Note, ...]:
+    """Return all notes that do not have text matching input."""
+
+    return tuple(
+        select_notes(
+            f"{MESSAGE_COLUMN} not {get_engine().ilike} ?", ["%" + unmatch + "%"]
+        )
+    )
+
+
+def search_notes(
+    search: str, since: datetime | None = None, until: datetime | None = None
+) -> tuple[Note, ...]:
+    """Return notes that contain every search word, best match first. Words
+    match stemmed note terms or term prefixes; matches are ranked with BM25
+    (without document length normalization). Optionally only notes dated since
+    and until (exclusive) a time."""
+
+    words = tuple(dict.fromkeys(TERM_PATTERN.findall(search.lower())))
+
+    if not words:
+        return ()
+
+    query_words = ", ".join("(?, ?, ?, ?)" for _ in words)
+    params: list[object] = []
+    for position, word in enumerate(words):
+        params += [position, stem(word), word, word + "\U0010ffff"]
+
+    query = f"""
+    with
+    words(position, stem, prefix_low, prefix_high) as (
+        values {query_words}
+    ),
+    matches as (
+        select
+            w.position,
+            t.{NID_COLUMN},
+            sum(t.{COUNT_COLUMN}) as frequency
+        from
+            words w
+            join {TERMS_TABLE} t
+                on t.{TERM_COLUMN} = w.stem
+                or (t.{TERM_COLUMN} >= w.prefix_low and t.{TERM_COLUMN} < w.prefix_high)
+        group by
+            w.position,
+            t.{NID_COLUMN}
+    ),
+    documents as (
+        select
+            position,
+            count(*) as frequency
+        from
+            matches
+        group by
+            position
+    ),
+    scores as (
+        select
+            m.{NID_COLUMN},
+            count(*) as matched,
+            sum(
+                ln(1 + ((select count(*) from {TABLE}) - d.frequency + 0.5)
+                    / (d.frequency + 0.5))
+                * m.frequency * {BM25_K1 + 1} / (m.frequency + {BM25_K1})
+            ) as score
+        from
+            matches m
+            join documents d on d.position = m.position
+        group by
+            m.{NID_COLUMN}
+    )
+
+    select
+        n.{DID_COLUMN},
+        n.{TIMESTAMP_COLUMN},
+        n.{MESSAGE_COLUMN}
     from
-        {TABLE}
+        {TABLE} n
+        join scores s on s.{NID_COLUMN} = n.{NID_COLUMN}
     where
-        {MESSAGE_COLUMN} ilike ?
+        s.matched = {len(words)}
+        {"".join(f" and n.{bound}" for bound in date_bounds(since, until))}
     order by
-        1;
+        s.score desc,
+        1 desc;
     """
+    params += [date for date in (since, until) if date is not None]
 
-    with get_connection() as con:
-        matches = con.execute(query, ["%:" + tag + ":%"]).fetchall()
+    with trace.span("query"), transaction() as con:
+        rows = con.execute(query, params).fetchall()
 
-    # covert each match row into a Note
-    notes = tuple(Note(*row) for row in matches)
+    # covert each row into a Note
+    with trace.span("notes"):
+        notes = tuple(Note(*row) for row in rows)
 
     return notes
 
 
+def get_tag_matches(tag: str) -> tuple[Note, ...]:
+    """Return all notes that have tags matching input."""
+
+    return get_tagged_notes(any_of=(tag,))
+
+
 def get_tag_unmatches(tag: str) -> tuple[Note, ...]:
     """Return all notes that do not have tags matching input."""
 
+    return get_tagged_notes(none_of=(tag,))
+
+
+def get_tagged_notes(
+    any_of: tuple[str, ...] = (),
+    all_of: tuple[str, ...] = (),
+    none_of: tuple[str, ...] = (),
+) -> tuple[Note, ...]:
+    """Return all notes that have any of, all of, and none of input tags (tags
+    match case-insensitively). Conditions without tags are ignored."""
+
+    return tuple(iter_tagged_notes(any_of, all_of, none_of))
+
+
+def iter_tagged_notes(
+    any_of: tuple[str, ...] = (),
+    all_of: tuple[str, ...] = (),
+    none_of: tuple[str, ...] = (),
+    descending: bool = False,
+    before: int | None = None,
+    limit: int | None = None,
+) -> Iterator[Note]:
+    """Yield notes that have any of, all of, and none of input tags in nid order.
+    Optionally only notes before a nid and only the first limit notes."""
+
+    conditions: list[str] = []
+    params: list[str] = []
+
+    if any_of:
+        conditions.append(f"""
+        {NID_COLUMN} in (
+            select {NID_COLUMN} from {TAGS_TABLE}
+            where {TAG_COLUMN} in ({generate_query_insert(any_of)})
+        )""")
+        params += [tag.lower() for tag in any_of]
+
+    if all_of:
+        all_tags = tuple(dict.fromkeys(tag.lower() for tag in all_of))
+        conditions.append(f"""
+        {NID_COLUMN} in (
+            select {NID_COLUMN} from {TAGS_TABLE}
+            where {TAG_COLUMN} in ({generate_query_insert(all_tags)})
+            group by {NID_COLUMN}
+            having count(*) = {len(all_tags)}
+        )""")
+        params += all_tags
+
+    if none_of:
+        conditions.append(f"""
+        {NID_COLUMN} not in (
+            select {NID_COLUMN} from {TAGS_TABLE}
+            where {TAG_COLUMN} in ({generate_query_insert(none_of)})
+        )""")
+        params += [tag.lower() for tag in none_of]
+
+    return select_notes(
+        " and ".join(conditions) or f"{NID_COLUMN} is not null",
+        params,
+        descending=descending,
+        before=before,
+        limit=limit,
+    )
+
+
+def update_note(id: int, message: str) -> Note | None:
+    """Replace note text of identified note with provided input. Return updated
+    note (None if there is no such note)."""
+
     query = f"""
-    select
+    update
+        {TABLE}
+    set
+        {MESSAGE_COLUMN} = ?
+    where
+        {DID_COLUMN} = ?
+    returning
         {NID_COLUMN},
+        {DID_COLUMN},
         {TIMESTAMP_COLUMN},
-        {MESSAGE_COLUMN}
-    from
+        {MESSAGE_COLUMN};
+    """
+
+    return update_returning(query, [message, id])
+
+
+def append_note(id: int, text: str) -> Note | None:
+    """Append text (space separated) to identified note. Return updated note
+    (None if there is no such note)."""
+
+    query = f"""
+    update
         {TABLE}
+    set
+        {MESSAGE_COLUMN} = {MESSAGE_COLUMN} || ' ' || ?
     where
-        {MESSAGE_COLUMN} not ilike ?
-    order by
-        1;
+        {DID_COLUMN} = ?
+    returning
+        {NID_COLUMN},
+        {DID_COLUMN},
+        {TIMESTAMP_COLUMN},
+        {MESSAGE_COLUMN};
     """
 
-    with get_connection() as con:
-        unmatches = con.execute(query, ["%:" + tag + ":%"]).fetchall()
+    return update_returning(query, [text, id])
 
-    # covert each unmatch row into a Note
-    notes = tuple(Note(*row) for row in unmatches)
 
-    return notes
+def update_returning(query: str, params: Sequence[object]) -> Note | None:
+    """Run single note update (returning the note row) and reindex the note in
+    one transaction. Return updated note (None if no note was updated)."""
+
+    with transaction(write=True) as con:
+        row = con.execute(query, params).fetchone()
+        if row is None:
+            return None
+
+        nid, *_, message = row
+        reindex_notes(con, get_engine(), ((nid, message),))
+
+    return Note(*row[1:])
+
 
+def reset_note(id: int) -> Note | None:
+    """Renumber identified note as the newest note, with a new timestamp. Return
+    reset note (None if there is no such note)."""
 
-def update_note(id: int, message: str) -> None:
-    """Replace note text of identified note with provided input."""
+    engine = get_engine()
 
+    # renumber the note in the database - the message never leaves it
     query = f"""
     update
         {TABLE}
     set
-        {MESSAGE_COLUMN} = ?
+        {DID_COLUMN} = (select max({DID_COLUMN}) + 1 from {TABLE}),
+        {TIMESTAMP_COLUMN} = {engine.now}
     where
-        {NID_COLUMN} = ?;
+        {DID_COLUMN} = ?
+    returning
+        {DID_COLUMN},
+        {TIMESTAMP_COLUMN},
+        {MESSAGE_COLUMN};
     """
 
-    with get_connection() as con:
-        con.execute(query, [message, id])
+    with transaction(write=True) as con:
+        row = con.execute(query, [id]).fetchone()
+
+    return None if row is None else Note(*row)
 
 
 def create_notes(entries: tuple[str, ...]) -> tuple[Note, ...]:
-    """Add notes to database using note text inputs."""
+    """Add notes to database using note text inputs. Notes share one timestamp
+    and are numbered in input order."""
 
-    rows: list[tuple[int, datetime, str]] = []
+    engine = get_engine()
 
-    with get_connection() as con:
-        con.begin()
-        for message in entries:
-            query = f"""
-            insert into {TABLE}
-                ({TIMESTAMP_COLUMN}, {MESSAGE_COLUMN})
-            values
-                (cast('{datetime.now()}' as timestamp), ?)
-            returning *;
-            """
-            rows += con.execute(query, [message]).fetchall()
-        con.commit()
+    with transaction(write=True) as con:
+        (timestamp,) = con.execute(f"select {engine.now};").fetchone()
+        did_next = next_display_id(con)
 
-    # covert each row into a Note
-    notes = tuple(Note(*row) for row in rows)
+        rows = insert_notes(
+            con,
+            engine,
+            [(did_next + i, timestamp, message) for i, message in enumerate(entries)],
+        )
+
+        index_notes(con, engine, ((nid, message) for nid, _, _, message in rows))
+
+    # covert each row into a Note (in nid order)
+    notes = tuple(Note(*row[1:]) for row in sorted(rows, key=lambda row: row[1]))
 
     return notes
 
 
 def rebase() -> None:
-    """Rebase note identifiers starting at 1."""
+    """Rebase note identifiers starting at 1. Only display identifiers that
+    change are rewritten (stable nids and note indexes are untouched)."""
 
+    # moved notes pass through negated identifiers - sqlite checks the unique
+    # index row by row, and a note may move to an identifier not yet vacated
     query = f"""
-    with n{NID_COLUMN} as (
+    with renumbered as (
             select
-                row_number() over(order by {NID_COLUMN})
-                    as updated_{NID_COLUMN},
                 {NID_COLUMN},
-                {TIMESTAMP_COLUMN},
-                {MESSAGE_COLUMN}
+                row_number() over(order by {DID_COLUMN}) as updated_{DID_COLUMN}
             from
                 {TABLE}
     )
 
     update
-        {TABLE} n
+        {TABLE} as n
     set
-        {NID_COLUMN} = nn.updated_{NID_COLUMN}
+        {DID_COLUMN} = -r.updated_{DID_COLUMN}
     from
-        n{NID_COLUMN} nn
+        renumbered r
     where
-        n.{NID_COLUMN} = nn.{NID_COLUMN};
+        n.{NID_COLUMN} = r.{NID_COLUMN}
+        and n.{DID_COLUMN} <> r.updated_{DID_COLUMN};
     """
 
-    with get_connection() as con:
-        con.begin()
+    with transaction(write=True) as con:
+        con.execute(query)
+        con.execute(
+            f"update {TABLE} set {DID_COLUMN} = -{DID_COLUMN} where {DID_COLUMN} < 0;"
+        )
+
+
+def change(
+    ids: tuple[int, ...], change_from: str, change_to: str, regex: bool = False
+) -> tuple[Note, ...]:
+    """Perform string replace operation on selected notes (regular expression
+    replace if regex). Return changed notes."""
+
+    return replace_notes(
+        f"{DID_COLUMN} in ({generate_query_insert(ids)})",
+        ids,
+        change_from,
+        change_to,
+        regex,
+    )
 
-        con.execute(query)  # rebase nids
 
-        # retrieve next nid in sequence
-        resp = con.execute(
-            f"select coalesce(max({NID_COLUMN}), 0) + 1 from {TABLE}"
-        ).fetchone()
-        if resp is None:
-            # should never happen due do COALESCE, but required by type checker
-            raise DatabaseCorrupted("Failed to retrieve max NID from database")
-        nid_next = resp[0]
+def change_all(
+    change_from: str, change_to: str, regex: bool = False
+) -> tuple[Note, ...]:
+    """Perform string replace operation on all notes (regular expression replace
+    if regex). Return changed notes."""
 
-        con.execute(
-            f"create or replace sequence nid_sequence start {nid_next}"
-        )  # reset sequence
+    return replace_notes(f"{NID_COLUMN} is not null", (), change_from, change_to, regex)
 
-        con.commit()
 
+def replace_notes(
+    condition: str,
+    params: Sequence[object],
+    change_from: str,
+    change_to: str,
+    regex: bool = False,
+) -> tuple[Note, ...]:
+    """Replace text (or regular expression matches) in notes matching
+    parameterized condition, in one statement that only updates notes containing
+    the text. Return changed notes. Raise ValueError if there is nothing to
+    replace, or the regular expression (or its replacement) is invalid."""
 
-def change(ids: tuple[int, ...], change_from: str, change_to: str) -> None:
-    """Perform string replace operation on selected notes."""
+    if not change_from:
+        raise ValueError("empty replace text")
 
-    query = f"""
-    update
-        {TABLE}
-    set
-        {MESSAGE_COLUMN} = replace({MESSAGE_COLUMN}, '{change_from}', '{change_to}')
-    where
-        {NID_COLUMN} in ({generate_query_insert(ids)});
-    """
+    engine = get_engine()
 
-    with get_connection() as con:
-        con.execute(query, ids)
+    if regex:
+        # checked with python re - the database may still reject expressions
+        # re accepts (duckdb regular expressions have no lookaround)
+        try:
+            pattern = re.compile(change_from)
+        except re.error as error:
+            raise ValueError(f"invalid regular expression ({error})") from error
 
+        try:
+            pattern.sub(change_to, "")  # parses the replacement groups
+        except (re.error, IndexError) as error:
+            raise ValueError(f"invalid replacement ({error})") from error
 
-def change_all(change_from: str, change_to: str) -> None:
-    """Perform string replace operation on all notes."""
+        replacement = f"regexp_replace({MESSAGE_COLUMN}, ?, ?, 'g')"
+        match = f"regexp_matches({MESSAGE_COLUMN}, ?)"
+    else:
+        replacement = f"replace({MESSAGE_COLUMN}, ?, ?)"
+        match = f"instr({MESSAGE_COLUMN}, ?) > 0"
 
     query = f"""
     update
         {TABLE}
     set
-        {MESSAGE_COLUMN} = replace({MESSAGE_COLUMN}, '{change_from}', '{change_to}');
+        {MESSAGE_COLUMN} = {replacement}
+    where
+        ({condition}) and {match}
+    returning
+        {NID_COLUMN},
+        {DID_COLUMN},
+        {TIMESTAMP_COLUMN},
+        {MESSAGE_COLUMN};
     """
 
-    with get_connection() as con:
-        con.execute(query)
+    with transaction(write=True) as con:
+        try:
+            rows = con.execute(
+                query, [change_from, change_to, *params, change_from]
+            ).fetchall()
+        except engine.invalid_input_errors() as error:
+            raise ValueError(f"invalid regular expression ({error})") from error
+
+        reindex_notes(con, engine, ((nid, message) for nid, _, _, message in rows))
+
+    # covert each row into a Note (in nid order)
+    notes = tuple(Note(*row[1:]) for row in sorted(rows, key=lambda row: row[1]))
+
+    return notes
 
 
 def is_valid(id: int) -> bool:
@@ -391,15 +1627,263 @@ def is_valid(id: int) -> bool:
     from
         {TABLE}
     where
-        {NID_COLUMN} = ?;
+        {DID_COLUMN} = ?;
     """
 
-    with get_connection() as con:
+    with transaction() as con:
         count, *_ = con.execute(query, [id]).fetchall()[0]
 
     return count > 0
 
 
+def missing_ids(ids: Iterable[int]) -> tuple[int, ...]:
+    """Return identifiers (in input order) that do not identify a note."""
+
+    ids = tuple(ids)
+    missing: set[int] = set()
+
+    engine = get_engine()
+
+    with transaction() as con:
+        for start in range(0, len(ids), engine.batch_size):
+            batch = [(id,) for id in ids[start : start + engine.batch_size]]
+            query = f"""
+            select
+                v0
+            from
+                ({engine.rows_query(("integer",), len(batch))})
+            where
+                v0 not in (select {DID_COLUMN} from {TABLE});
+            """
+            missing.update(
+                id for (id,) in con.execute(query, engine.rows_params(batch)).fetchall()
+            )
+
+    return tuple(id for id in ids if id in missing)
+
+
 def generate_query_insert(elems: Iterable) -> str:
     """Generate parameterized query insert."""
     return ", ".join("?" for _ in elems)
+
+
+## archive ##
+# completed notes move to an archive table (delete_notes with archive). the
+# notes table (and its indexes) only holds live notes - archived notes are
+# read by scanning the archive, and only when asked for
+
+
+class ArchiveStats(NamedTuple):
+    """archive summary"""
+
+    count: int  # archived notes
+    live: int  # notes not archived
+    years: tuple[tuple[str, int], ...]  # archived notes per year (note date)
+    last_archived: datetime | None
+
+
+def search_archive(search: str = "") -> tuple[Note, ...]:
+    """Return archived notes containing every search word (case-insensitive),
+    most recently archived first. Archived notes are identified by nid."""
+
+    words = search.split()
+    condition = " and ".join(f"{MESSAGE_COLUMN} {get_engine().ilike} ?" for _ in words)
+
+    query = f"""
+    select
+        {NID_COLUMN},
+        {TIMESTAMP_COLUMN},
+        {MESSAGE_COLUMN}
+    from
+        {ARCHIVE_TABLE}
+    where
+        {condition or "true"}
+    order by
+        {ARCHIVED_COLUMN} desc,
+        {NID_COLUMN} desc;
+    """
+
+    with transaction() as con:
+        rows = con.execute(query, [f"%{word}%" for word in words]).fetchall()
+
+    return tuple(Note(*row) for row in rows)
+
+
+def archive_stats() -> ArchiveStats:
+    """Return archive summary."""
+
+    with transaction() as con:
+        (count, live) = con.execute(f"""
+            select
+                (select count(*) from {ARCHIVE_TABLE}),
+                (select count(*) from {TABLE});
+        """).fetchone()
+        years = con.execute(f"""
+            select
+                substr(cast({TIMESTAMP_COLUMN} as varchar), 1, 4) as year,
+                count(*)
+            from
+                {ARCHIVE_TABLE}
+            group by
+                year
+            order by
+                year;
+        """).fetchall()
+        last = con.execute(f"""
+            select
+                {ARCHIVED_COLUMN}
+            from
+                {ARCHIVE_TABLE}
+            order by
+                {ARCHIVED_COLUMN} desc
+            limit 1;
+        """).fetchone()
+
+    return ArchiveStats(
+        count, live, tuple(map(tuple, years)), None if last is None else last[0]
+    )
+
+
+## note indexes ##
+# tag and search term tables derived from note text - every write that
+# creates, changes, or removes notes updates them in the same transaction
+
+
+def index_notes(
+    con: Connection, engine: Engine, notes: Iterable[tuple[int, str]]
+) -> None:
+    """Add index rows for (nid, message) notes."""
+
+    notes = tuple(notes)
+
+    index_tags(con, engine, notes)
+    index_terms(con, engine, notes)
+
+
+def unindex_notes(con: Connection, engine: Engine, ids: Iterable[int]) -> None:
+    """Remove index rows of identified notes."""
+
+    ids = tuple(ids)
+
+    for start in range(0, len(ids), engine.batch_size):
+        batch = [(id,) for id in ids[start : start + engine.batch_size]]
+        for table in INDEX_TABLES:
+            con.execute(
+                f"delete from {table} where {NID_COLUMN} in"
+                + f" (select v0 from ({engine.rows_query(('integer',), len(batch))}));",
+                engine.rows_params(batch),
+            )
+
+
+def reindex_notes(
+    con: Connection, engine: Engine, notes: Iterable[tuple[int, str]]
+) -> None:
+    """Replace index rows of changed (nid, message) notes."""
+
+    notes = tuple(notes)
+
+    unindex_notes(con, engine, (nid for nid, _ in notes))
+    index_notes(con, engine, notes)
+
+
+def parse_tags(message: str) -> tuple[str, ...]:
+    """Return distinct tags of note text (lowercase, in order of appearance)."""
+
+    return tuple(dict.fromkeys(tag.lower() for tag in TAG_PATTERN.findall(message)))
+
+
+def index_tags(
+    con: Connection, engine: Engine, notes: Iterable[tuple[int, str]]
+) -> None:
+    """Add tag index rows for (nid, message) notes."""
+
+    rows = [(nid, tag) for nid, message in notes for tag in parse_tags(message)]
+
+    insert_rows(
+        con, engine, TAGS_TABLE, (NID_COLUMN, TAG_COLUMN), ("integer", "varchar"), rows
+    )
+
+
+def parse_terms(message: str) -> dict[str, int]:
+    """Return search terms of note text (stemmed) with their counts."""
+
+    terms: dict[str, int] = {}
+
+    for word in TERM_PATTERN.findall(message.lower()):
+        term = stem(word)
+        terms[term] = terms.get(term, 0) + 1
+
+    return terms
+
+
+def index_terms(
+    con: Connection, engine: Engine, notes: Iterable[tuple[int, str]]
+) -> None:
+    """Add search term index rows for (nid, message) notes."""
+
+    rows = [
+        (nid, term, count)
+        for nid, message in notes
+        for term, count in parse_terms(message).items()
+    ]
+
+    insert_rows(
+        con,
+        engine,
+        TERMS_TABLE,
+        (NID_COLUMN, TERM_COLUMN, COUNT_COLUMN),
+        ("integer", "varchar", "integer"),
+        rows,
+    )
+
+
+# light english stemming - (suffix, replacement, suffix exceptions)
+STEM_RULES: tuple[tuple[str, str, tuple[str, ...]], ...] = (
+    ("sses", "ss", ()),
+    ("ies", "y", ("aies", "eies")),
+    ("es", "e", ("aes", "ees", "oes")),
+    ("s", "", ("us", "ss", "is")),
+    ("ing", "", ()),
+    ("ed", "", ("eed",)),
+    ("ly", "", ()),
+)
+MIN_STEM_LENGTH = 3
+
+
+@lru_cache(maxsize=65_536)
+def stem(word: str) -> str:
+    """Return stem of lowercase word (strip common inflection suffixes)."""
+
+    for suffix, replacement, exceptions in STEM_RULES:
+        if not word.endswith(suffix) or word.endswith(exceptions):
+            continue
+
+        base = word[: -len(suffix)]
+        if len(base) < MIN_STEM_LENGTH:
+            return word
+
+        if suffix in ("ing", "ed") and base[-1] == base[-2] and base[-1] not in "lsz":
+            base = base[:-1]  # undouble final consonant (running -> run)
+
+        return base + replacement
+
+    return word
+
+
+def insert_rows(
+    con: Connection,
+    engine: Engine,
+    table: str,
+    columns: tuple[str, ...],
+    types: tuple[str, ...],
+    rows: Sequence[tuple],
+) -> None:
+    """Insert rows into table columns (of provided types), one statement per batch."""
+
+    for start in range(0, len(rows), engine.batch_size):
+        batch = rows[start : start + engine.batch_size]
+        con.execute(
+            f"insert into {table} ({', '.join(columns)})"
+            + f" select * from ({engine.rows_query(types, len(batch))});",
+            engine.rows_params(batch),
+        )
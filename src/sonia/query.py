@@ -0,0 +1,234 @@
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sonia.notedb import (
+    MESSAGE_COLUMN,
+    NID_COLUMN,
+    TAG_COLUMN,
+    TAGS_TABLE,
+    TIMESTAMP_COLUMN,
+    get_engine,
+)
+
+
+__all__ = [
+    "Filter",
+    "FilterSyntaxError",
+    "compile_filter",
+    "parse_date",
+]
+
+
+## filter expressions ##
+# notes are filtered with expressions like
+#
+#   :mit: or :tod: and not :que: and "invoice" since 7d
+#
+# terms are tags (:tag:), text (words or "quoted text", case-insensitive and
+# matched literally - % and _ are no wildcards), and date bounds (since/until
+# date). terms combine with not, and, or (binding in
+# that order), juxtaposed terms are and-ed, and parentheses group. expressions
+# compile to one parameterized where clause
+
+
+class Filter(NamedTuple):
+    """compiled filter expression (parameterized where clause)"""
+
+    condition: str
+    params: tuple[object, ...]
+
+
+class FilterSyntaxError(ValueError):
+    """Filter expression is malformed."""
+
+
+KEYWORDS = ("and", "or", "not", "since", "until")
+
+TOKEN = re.compile(
+    r'\s*(?:(?P<paren>[()])|"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<word>[^\s()"]+))'
+)
+TAG_WORD = re.compile(r":([a-zA-Z0-9]+):")
+ESCAPE = re.compile(r"\\(.)")
+LIKE_WILDCARD = re.compile(r"([%_\\])")
+
+
+def compile_filter(expression: str) -> Filter:
+    """Return filter (where clause) of expression. Raise FilterSyntaxError if
+    the expression is malformed."""
+
+    tokens = tokenize(expression)
+
+    if not tokens:
+        return Filter(f"{NID_COLUMN} is not null", ())
+
+    parser = _Parser(tokens)
+    condition = parser.or_terms()
+
+    if (token := parser.peek()) is not None:
+        raise FilterSyntaxError(f"unexpected {token[1]!r}")
+
+    return Filter(condition, tuple(parser.params))
+
+
+def tokenize(expression: str) -> list[tuple[str, str]]:
+    """Return (kind, value) tokens of expression - paren, keyword, tag, text."""
+
+    tokens: list[tuple[str, str]] = []
+    position = 0
+
+    while expression[position:].strip():
+        match = TOKEN.match(expression, position)
+        if match is None:
+            raise FilterSyntaxError("unterminated quote")
+
+        position = match.end()
+
+        if (paren := match["paren"]) is not None:
+            tokens.append(("paren", paren))
+        elif (quoted := match["quoted"]) is not None:
+            tokens.append(("text", ESCAPE.sub(r"\1", quoted)))
+        elif (word := match["word"]).lower() in KEYWORDS:
+            tokens.append(("keyword", word.lower()))
+        elif tag := TAG_WORD.fullmatch(word):
+            tokens.append(("tag", tag[1].lower()))
+        else:
+            tokens.append(("text", word))
+
+    return tokens
+
+
+class _Parser:
+    """Recursive descent filter parser. Terms compile to conditions as they are
+    parsed - parameters are collected in order."""
+
+    def __init__(self, tokens: list[tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+        self.params: list[object] = []
+
+    def peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> tuple[str, str]:
+        if (token := self.peek()) is None:
+            raise FilterSyntaxError("incomplete expression")
+
+        self.position += 1
+
+        return token
+
+    def or_terms(self) -> str:
+        conditions = [self.and_terms()]
+
+        while self.peek() == ("keyword", "or"):
+            self.take()
+            conditions.append(self.and_terms())
+
+        return conditions[0] if len(conditions) == 1 else f"({' or '.join(conditions)})"
+
+    def and_terms(self) -> str:
+        conditions = [self.not_term()]
+
+        while (token := self.peek()) is not None and token not in (
+            ("keyword", "or"),
+            ("paren", ")"),
+        ):
+            if token == ("keyword", "and"):
+                self.take()
+            conditions.append(self.not_term())
+
+        return (
+            conditions[0] if len(conditions) == 1 else f"({' and '.join(conditions)})"
+        )
+
+    def not_term(self) -> str:
+        if self.peek() == ("keyword", "not"):
+            self.take()
+            return f"not {self.not_term()}"
+
+        return self.term()
+
+    def term(self) -> str:
+        kind, value = self.take()
+
+        match kind, value:
+            case "paren", "(":
+                condition = self.or_terms()
+                if self.take() != ("paren", ")"):
+                    raise FilterSyntaxError("missing )")
+                return condition
+            case "tag", tag:
+                self.params.append(tag)
+                return (
+                    f"({NID_COLUMN} in (select {NID_COLUMN} from {TAGS_TABLE}"
+                    + f" where {TAG_COLUMN} = ?))"
+                )
+            case "text", text:
+                literal = LIKE_WILDCARD.sub(r"\\\1", text)
+                self.params.append(f"%{literal}%")
+                return f"({MESSAGE_COLUMN} {get_engine().ilike} ? escape '\\')"
+            case "keyword", "since" | "until" as bound:
+                date_kind, date = self.take()
+                if date_kind != "text":
+                    raise FilterSyntaxError(f"missing date after {bound}")
+                if date.lower() in CALENDAR_OFFSETS and self.peek() is not None:
+                    date = f"{date} {self.take()[1]}"  # this week, last month
+                self.params.append(parse_date(date))
+                operator = ">=" if bound == "since" else "<"
+                return f"({TIMESTAMP_COLUMN} {operator} ?)"
+
+        raise FilterSyntaxError(f"unexpected {value!r}")
+
+
+## dates ##
+
+RELATIVE_DATE = re.compile(r"(\d+)([hdw])")
+DATE_UNITS = {"h": timedelta(hours=1), "d": timedelta(days=1), "w": timedelta(weeks=1)}
+
+CALENDAR_DATE = re.compile(r"(this|last)[\s_-]+(week|month|year)")
+CALENDAR_OFFSETS = ("this", "last")
+
+
+def parse_date(text: str, now: datetime | None = None) -> datetime:
+    """Return time described by date text: relative to now (12h, 7d, 2w ago),
+    today, yesterday, the start of this or last week (monday), month or year,
+    or an iso date (and time). Raise FilterSyntaxError if the text is not a
+    date."""
+
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    text = text.lower().strip()
+
+    if calendar := CALENDAR_DATE.fullmatch(text):
+        return calendar_start(today, calendar[2], calendar[1] == "last")
+
+    if text == "today":
+        return today
+
+    if text == "yesterday":
+        return today - DATE_UNITS["d"]
+
+    if relative := RELATIVE_DATE.fullmatch(text):
+        return now - int(relative[1]) * DATE_UNITS[relative[2]]
+
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise FilterSyntaxError(f"invalid date {text!r}") from None
+
+
+def calendar_start(today: datetime, period: str, last: bool) -> datetime:
+    """Return start of the week, month or year containing today (or of the one
+    before, if last)."""
+
+    match period:
+        case "week":
+            start = today - timedelta(days=today.weekday())
+            return start - DATE_UNITS["w"] if last else start
+        case "month":
+            start = today.replace(day=1)
+            return (start - DATE_UNITS["d"]).replace(day=1) if last else start
+        case _:
+            start = today.replace(month=1, day=1)
+            return start.replace(year=start.year - 1) if last else start
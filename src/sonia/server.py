@@ -0,0 +1,292 @@
+import io
+import json
+import os
+import shutil
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import socket
+
+
+__all__ = [
+    "forward",
+    "serve",
+    "socket_path",
+]
+
+
+## resident server ##
+# `sonia serve` keeps the database connection (and the imports behind it) warm
+# and runs commands sent over a unix socket. the sonia entry point forwards
+# its arguments when the socket exists and runs commands in-process otherwise
+
+DEFAULT_SOCKET = "~/.sonia.sock"
+
+# client environment that shapes command output
+FORWARDED_ENV = (
+    "COLORTERM",
+    "TERM",
+    "NO_COLOR",
+    "FORCE_COLOR",
+    "TTY_COMPATIBLE",
+    "SONIA_ANIMATE",
+)
+
+# output frames: channel (1 byte), length (4 bytes), data
+STDOUT = b"o"
+STDERR = b"e"
+FRAME_HEADER_SIZE = 5
+
+
+# commands that may read standard input - the client streams its input after
+# the request, the server reads it as the command's stdin
+STDIN_COMMANDS = ("add", "a", "capture", "cap", "batch")
+STDIN_CHUNK_SIZE = 1 << 16
+
+
+def socket_path() -> Path:
+    """Return server socket path (SONIA_SOCKET, or ~/.sonia.sock)."""
+
+    return Path(os.environ.get("SONIA_SOCKET") or DEFAULT_SOCKET).expanduser()
+
+
+## client ##
+
+
+def forward(args: Sequence[str]) -> bool:
+    """Run command on the resident server, copying its output to stdout and
+    stderr. Return False if no server is running."""
+
+    path = socket_path()
+
+    if not path.exists():
+        return False
+
+    import socket  # deferred - only needed when a server is running
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except OSError:  # stale socket
+        client.close()
+        return False
+
+    with client:
+        request = client_request(args)
+        client.sendall(json.dumps(request).encode() + b"\n")
+
+        if request["stdin"]:
+            # send input while output is read - the command consumes it as it
+            # arrives, and may write output before reading all of it
+            import threading
+
+            threading.Thread(target=send_stdin, args=(client,), daemon=True).start()
+
+        outputs = {STDOUT: sys.stdout, STDERR: sys.stderr}
+        reader = client.makefile("rb")
+
+        while header := reader.read(FRAME_HEADER_SIZE):
+            channel, size = header[:1], int.from_bytes(header[1:], "big")
+            output = outputs[channel]
+            output.buffer.write(reader.read(size))
+            output.flush()
+
+    return True
+
+
+def reads_stdin(args: Sequence[str]) -> bool:
+    """Return whether command reads standard input - a "-" argument, or (batch)
+    no arguments besides options."""
+
+    if args[:1] == ["db"]:
+        args = args[2:]
+
+    match args:
+        case "batch", *cargs:
+            return "-" in cargs or all(arg.startswith("--") for arg in cargs)
+        case cmd_id, *cargs if cmd_id in STDIN_COMMANDS:
+            return "-" in cargs
+
+    return False
+
+
+def client_request(args: Sequence[str]) -> dict:
+    """Return request describing command and client terminal."""
+
+    env = {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ}
+
+    if sys.stdout.isatty():
+        columns, lines = shutil.get_terminal_size()
+        env |= {"COLUMNS": str(columns), "LINES": str(lines)}
+
+    return {
+        "args": list(args),
+        "cwd": os.getcwd(),
+        "env": env,
+        "tty": {"stdout": sys.stdout.isatty(), "stderr": sys.stderr.isatty()},
+        "stdin": reads_stdin(args),
+    }
+
+
+def send_stdin(client: "socket.socket") -> None:
+    """Send standard input to the server in chunks, then end the request."""
+
+    import socket
+
+    stdin: io.BufferedIOBase = sys.stdin.buffer  # ty: ignore[invalid-assignment]
+
+    try:
+        # read1 returns what is available - lines are sent as they are typed
+        while data := stdin.read1(STDIN_CHUNK_SIZE):
+            client.sendall(data)
+        client.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass  # server went away
+
+
+## server ##
+
+
+class SocketOutput(io.TextIOBase):
+    """Text stream written to a client as output frames."""
+
+    def __init__(self, con: "socket.socket", channel: bytes, tty: bool) -> None:
+        self.con = con
+        self.channel = channel
+        self.tty = tty
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def write(self, s: str) -> int:
+        data = s.encode()
+        if data:
+            self.con.sendall(self.channel + len(data).to_bytes(4, "big") + data)
+
+        return len(s)
+
+
+def serve() -> None:
+    """Serve commands on the socket until interrupted."""
+
+    import signal
+    import socket
+
+    from sonia import console_output as cons
+    from sonia import notedb as db
+
+    path = socket_path()
+
+    if server_running(path):
+        cons.send_error("server already running", str(path))
+        return
+
+    path.unlink(missing_ok=True)
+
+    # warm up - open database, load console
+    db.get_connection()
+    cons.get_console()
+
+    served_path, served_cwd = db.db_path, os.getcwd()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    os.chmod(path, 0o600)
+    server.listen()
+
+    cons.send_message("serving", f"{served_path} on {path}")
+
+    # stop on terminate like on interrupt (remove socket)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        while True:
+            con, _ = server.accept()
+            with con:
+                handle_request(con)
+
+            # commands may switch databases (db) - serve the original again
+            os.chdir(served_cwd)
+            db.set_path(str(served_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
+
+
+def server_running(path: Path) -> bool:
+    """Return whether a server accepts connections on socket path."""
+
+    import socket
+
+    if not path.exists():
+        return False
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except OSError:
+            return False
+
+    return True
+
+
+def handle_request(con: "socket.socket") -> None:
+    """Run requested command with its output sent to the client."""
+
+    import traceback
+    from contextlib import redirect_stderr, redirect_stdout
+
+    from sonia import commands as cmd
+    from sonia import console_output as cons
+
+    reader = con.makefile("rb")
+
+    try:
+        request = json.loads(reader.readline())
+    except ValueError:
+        return  # probe or broken client
+
+    stdout = SocketOutput(con, STDOUT, request["tty"]["stdout"])
+    stderr = SocketOutput(con, STDERR, request["tty"]["stderr"])
+
+    saved_env = os.environ.copy()
+    for name in (*FORWARDED_ENV, "COLUMNS", "LINES"):
+        os.environ.pop(name, None)
+    os.environ.update(request["env"])
+
+    # output settings are detected for the client terminal
+    cons.get_console.cache_clear()
+    cons.line_color_mode.cache_clear()
+
+    # client input follows the request line
+    stdin = (
+        io.TextIOWrapper(reader, encoding="utf-8", errors="replace")
+        if request.get("stdin")
+        else io.StringIO()
+    )
+    saved_stdin, sys.stdin = sys.stdin, stdin
+
+    try:
+        os.chdir(request["cwd"])
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                cmd.dispatch(request["args"])
+            except Exception:
+                traceback.print_exc()
+    except OSError:
+        pass  # client went away
+    finally:
+        sys.stdin = saved_stdin
+        stdin.close()
+        os.environ.clear()
+        os.environ.update(saved_env)
+        cons.get_console.cache_clear()
+        cons.line_color_mode.cache_clear()
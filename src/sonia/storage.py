@@ -0,0 +1,407 @@
+import math
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Protocol
+
+from sonia import trace
+
+
+__all__ = [
+    "Cursor",
+    "Connection",
+    "Engine",
+    "DuckDBEngine",
+    "SQLiteEngine",
+    "engines",
+    "engine_for",
+]
+
+
+class Cursor(Protocol):
+    """query result interface (dbapi cursor subset)"""
+
+    def fetchone(self) -> Any: ...
+
+    def fetchmany(self, size: int = ..., /) -> list[Any]: ...
+
+    def fetchall(self) -> list[Any]: ...
+
+
+class Connection(Protocol):
+    """database connection interface (dbapi connection subset)"""
+
+    def execute(self, query: str, parameters: Any = ..., /) -> Any: ...
+
+    def executemany(self, query: str, parameters: Any, /) -> Any: ...
+
+    def cursor(self) -> Any: ...
+
+    def close(self) -> None: ...
+
+
+class Engine(ABC):
+    """Storage engine objects. Hold the dialect differences between databases."""
+
+    name: str = ""
+
+    # case-insensitive pattern match operator
+    ilike: str = "ilike"
+
+    # current (local) timestamp expression
+    now: str = "current_localtimestamp()"
+
+    # next note identifier expression (insert value)
+    next_nid: str = "nextval('nid_sequence')"
+
+    # note identifier column type
+    nid_type: str = "integer primary key"
+
+    # statement starting a write transaction
+    begin_write: str = "begin;"
+
+    # rows per bulk statement
+    batch_size: int = 500
+
+    # database can copy query results to (json, csv, parquet) files
+    copies_files: bool = False
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+    @abstractmethod
+    def connect(self, path: Path) -> Connection:
+        """Open (or create) database file and return connection."""
+
+    @abstractmethod
+    def missing_table_errors(self) -> tuple[type[Exception], ...]:
+        """Return exception types raised when querying a table that does not exist."""
+
+    @abstractmethod
+    def constraint_errors(self) -> tuple[type[Exception], ...]:
+        """Return exception types raised when a statement violates a constraint."""
+
+    @abstractmethod
+    def invalid_input_errors(self) -> tuple[type[Exception], ...]:
+        """Return exception types raised when a function rejects its arguments
+        (e.g. a regular expression, or a value cast to another type)."""
+
+    @abstractmethod
+    def io_errors(self) -> tuple[type[Exception], ...]:
+        """Return exception types raised when a file cannot be read or written."""
+
+    def qualify(self, name: str) -> str:
+        """Return schema-qualified name of database object."""
+        return name
+
+    def schema_statements(self) -> tuple[str, ...]:
+        """Return statements that create and select the note schema."""
+        return ()
+
+    def use_schema(self, con: Connection) -> None:
+        """Select the note schema on an open connection."""
+
+    def cursor(self, con: Connection) -> Connection:
+        """Return cursor on connection whose results are independent of other
+        statements executed on the connection."""
+
+        return con.cursor()
+
+    def sequence_statements(self) -> tuple[str, ...]:
+        """Return statements that create the note identifier sequence."""
+        return ()
+
+    def updated_index_statements(self, table: str, column: str) -> tuple[str, ...]:
+        """Return statements that index a column updated in place (display
+        identifiers, dates)."""
+        return (f"create index {table}_{column} on {table} ({column});",)
+
+    def unique_index_statements(self, table: str, column: str) -> tuple[str, ...]:
+        """Return statements that replace the index of a column updated in place
+        by a unique index."""
+        return (
+            f"drop index if exists {table}_{column};",
+            f"create unique index {table}_{column}_unique on {table} ({column});",
+        )
+
+    @abstractmethod
+    def reset_sequence_statements(self, table: str, start: int) -> tuple[str, ...]:
+        """Return statements that restart the identifier sequence of table."""
+
+    def distinct_query(self, table: str, column: str) -> str:
+        """Return query selecting the distinct values of an indexed column (in
+        order)."""
+        return f"select distinct {column} from {table} order by {column};"
+
+    def gaps_query(self, table: str, column: str) -> str:
+        """Return query selecting the (previous, next) values around each gap of an
+        indexed integer column - consecutive values more than one apart (in
+        order)."""
+        return f"""
+            select previous, value from (
+                select
+                    lag({column}) over(order by {column}) as previous,
+                    {column} as value
+                from
+                    {table}
+            )
+            where value - previous > 1
+            order by value;
+        """
+
+    def rows_query(self, types: Sequence[str], count: int) -> str:
+        """Return query selecting count parameterized rows of values with provided
+        column types, as columns v0, v1, ... (in row order)."""
+
+        # values keep their python types - no casts needed
+        row = f"({', '.join('?' for _ in types)})"
+        columns = (f"column{i + 1} as v{i}" for i in range(len(types)))
+
+        return f"select {', '.join(columns)} from (values {', '.join(row for _ in range(count))})"
+
+    def rows_params(self, rows: Sequence[Sequence[object]]) -> list[object]:
+        """Return parameters of rows query selecting provided rows."""
+
+        return [value for row in rows for value in row]
+
+
+class DuckDBEngine(Engine):
+    """DuckDB storage engine (analytical archive databases)"""
+
+    name = "duckdb"
+
+    schema = "coredb"
+
+    copies_files = True
+
+    def connect(self, path: Path) -> Connection:
+        with trace.span("import duckdb"):
+            import duckdb  # deferred - large import
+
+        with trace.span("duckdb.connect"):
+            return duckdb.connect(path)
+
+    def missing_table_errors(self) -> tuple[type[Exception], ...]:
+        import duckdb
+
+        return (duckdb.CatalogException,)
+
+    def constraint_errors(self) -> tuple[type[Exception], ...]:
+        import duckdb
+
+        return (duckdb.ConstraintException,)
+
+    def invalid_input_errors(self) -> tuple[type[Exception], ...]:
+        import duckdb
+
+        return (duckdb.InvalidInputException, duckdb.ConversionException)
+
+    def io_errors(self) -> tuple[type[Exception], ...]:
+        import duckdb
+
+        return (duckdb.IOException,)
+
+    def qualify(self, name: str) -> str:
+        return f"{self.schema}.{name}"
+
+    def schema_statements(self) -> tuple[str, ...]:
+        return (
+            f"create schema if not exists {self.schema};",
+            f"set schema = {self.schema};",
+        )
+
+    def use_schema(self, con: Connection) -> None:
+        con.execute(f"set schema = {self.schema};")
+
+    def cursor(self, con: Connection) -> Connection:
+        cursor = con.cursor()  # duplicate connection (own session settings)
+        self.use_schema(cursor)
+
+        return cursor
+
+    def sequence_statements(self) -> tuple[str, ...]:
+        return ("create sequence if not exists nid_sequence start 1;",)
+
+    # not indexed - updates of indexed columns rewrite index entries (renumbering
+    # is many times slower), and column scans are fast. range filters on columns
+    # following insertion order (dates) skip row groups by their min/max
+    # statistics (zone maps) instead
+    def updated_index_statements(self, table: str, column: str) -> tuple[str, ...]:
+        return ()
+
+    # not unique either - besides the cost of an index, duckdb rejects a key
+    # deleted and inserted again in one transaction (a freed display identifier
+    # reused, rebase). a database file has one writing process, whose writers
+    # assign identifiers one at a time (notedb write lock)
+    def unique_index_statements(self, table: str, column: str) -> tuple[str, ...]:
+        return (f"drop index if exists {table}_{column}_unique;",)
+
+    def reset_sequence_statements(self, table: str, start: int) -> tuple[str, ...]:
+        return (f"create or replace sequence nid_sequence start {start};",)
+
+    # rows travel as one json parameter - duckdb binds python values one at a
+    # time (slowly), json is parsed natively
+
+    batch_size = 10_000
+
+    def rows_query(self, types: Sequence[str], count: int) -> str:
+        columns = (
+            f"cast(r[{i + 1}] as {type}) as v{i}" for i, type in enumerate(types)
+        )
+
+        return (
+            f"select {', '.join(columns)}"
+            + """ from (select unnest(from_json(?, '[["VARCHAR"]]')) as r)"""
+        )
+
+    def rows_params(self, rows: Sequence[Sequence[object]]) -> list[object]:
+        import json
+
+        return [json.dumps([list(row) for row in rows], default=str)]
+
+
+class SQLiteEngine(Engine):
+    """SQLite storage engine (interactive capture databases)"""
+
+    name = "sqlite"
+
+    ilike = "like"  # case-insensitive for ascii text
+
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+    next_nid = "null"  # autoincrement
+
+    nid_type = "integer primary key autoincrement"
+
+    # take the write lock up front - a deferred transaction that reads, then
+    # writes, fails (database is locked) if another connection wrote meanwhile
+    begin_write = "begin immediate;"
+
+    def connect(self, path: Path) -> Connection:
+        with trace.span("import sqlite3"):
+            import sqlite3
+
+        sqlite3.register_adapter(datetime, _format_timestamp)
+        sqlite3.register_converter("timestamp", _parse_timestamp)
+
+        # autocommit mode - transactions are explicit. connections are used by
+        # one thread at a time, but may be closed by another (async store)
+        with trace.span("sqlite3.connect"):
+            con = sqlite3.connect(
+                path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            con.execute("pragma journal_mode = wal;")
+
+        # math functions are optional in sqlite builds
+        con.create_function("ln", 1, math.log, deterministic=True)
+
+        # regular expression functions (as in duckdb)
+        con.create_function("regexp_matches", 2, _regexp_matches, deterministic=True)
+        con.create_function("regexp_replace", 4, _regexp_replace, deterministic=True)
+
+        return con
+
+    def missing_table_errors(self) -> tuple[type[Exception], ...]:
+        import sqlite3
+
+        return (sqlite3.OperationalError,)
+
+    def constraint_errors(self) -> tuple[type[Exception], ...]:
+        import sqlite3
+
+        return (sqlite3.IntegrityError,)
+
+    def invalid_input_errors(self) -> tuple[type[Exception], ...]:
+        import sqlite3
+
+        # user-defined function raised exception (regexp functions)
+        return (sqlite3.OperationalError,)
+
+    def io_errors(self) -> tuple[type[Exception], ...]:
+        import sqlite3
+
+        return (sqlite3.OperationalError,)  # disk i/o error, unable to open
+
+    def reset_sequence_statements(self, table: str, start: int) -> tuple[str, ...]:
+        return (
+            f"delete from sqlite_sequence where name = '{table}';",
+            f"insert into sqlite_sequence (name, seq) values ('{table}', {start - 1});",
+        )
+
+    def distinct_query(self, table: str, column: str) -> str:
+        # skip scan - one index seek per distinct value (sqlite scans the whole
+        # index for select distinct)
+        return f"""
+            with recursive distinct_values (value) as (
+                select min({column}) from {table}
+                union all
+                select (select min({column}) from {table} where {column} > value)
+                from distinct_values
+                where value is not null
+            )
+            select value from distinct_values where value is not null;
+        """
+
+    def gaps_query(self, table: str, column: str) -> str:
+        # index seeks - several times faster than a window function in sqlite.
+        # the previous value is sought for values starting a run only
+        return f"""
+            select
+                (select max({column}) from {table} where {column} < t.{column}),
+                t.{column}
+            from
+                {table} t
+            where
+                t.{column} > (select min({column}) from {table})
+                and not exists (
+                    select 1 from {table} where {column} = t.{column} - 1
+                )
+            order by 2;
+        """
+
+
+def _format_timestamp(value: datetime) -> str:
+    return value.isoformat(" ")
+
+
+def _parse_timestamp(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+def _regexp_matches(string: str, pattern: str) -> bool:
+    return re.search(pattern, string) is not None
+
+
+def _regexp_replace(string: str, pattern: str, replacement: str, options: str) -> str:
+    return re.sub(pattern, replacement, string, count=0 if "g" in options else 1)
+
+
+## engine selection ##
+
+engines: dict[str, Engine] = {
+    engine.name: engine for engine in (DuckDBEngine(), SQLiteEngine())
+}
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3")
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def engine_for(path: Path) -> Engine:
+    """Return storage engine for database file. Existing files are identified by
+    their header, new files by their suffix (.sqlite or .sqlite3 select SQLite)."""
+
+    try:
+        with open(path, "rb") as file:
+            header = file.read(len(SQLITE_HEADER))
+    except OSError:
+        header = b""
+
+    if header:
+        return engines["sqlite" if header == SQLITE_HEADER else "duckdb"]
+
+    return engines["sqlite" if path.suffix in SQLITE_SUFFIXES else "duckdb"]
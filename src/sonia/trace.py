@@ -0,0 +1,127 @@
+import atexit
+import os
+import sys
+import time
+from contextlib import AbstractContextManager, nullcontext
+
+
+__all__ = [
+    "enable",
+    "span",
+]
+
+
+## phase tracing ##
+# SONIA_TRACE=1 (or --trace) prints a per-phase timing breakdown to stderr at
+# exit. SONIA_TRACE=path.json (or --trace=path.json) writes chrome trace events
+# instead (chrome://tracing, ui.perfetto.dev). disabled spans are a shared
+# null context - nothing is recorded
+
+enabled: bool = False
+
+_output: str = ""
+_start: float = 0.0
+_depth: int = 0
+
+# finished spans - name, nesting depth, start, end (perf_counter seconds)
+_spans: list[tuple[str, int, float, float]] = []
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    """Timed phase (context manager)."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        global _depth
+
+        _depth += 1
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_: object) -> None:
+        global _depth
+
+        end = time.perf_counter()
+        _depth -= 1
+        _spans.append((self.name, _depth, self.start, end))
+
+
+def span(name: str) -> AbstractContextManager:
+    """Return context manager timing the enclosed phase (if tracing)."""
+
+    return _Span(name) if enabled else _NULL_SPAN
+
+
+def enable(output: str = "") -> None:
+    """Trace phases from now on. Report at exit - summary to stderr, or chrome
+    trace events to the output file if it is a path (ends with .json)."""
+
+    global enabled, _output, _start
+
+    if enabled:
+        return
+
+    enabled = True
+    _output = output
+    _start = time.perf_counter()
+
+    atexit.register(report)
+
+
+def report() -> None:
+    """Output traced phases."""
+
+    end = time.perf_counter()
+
+    if _output.endswith(".json"):
+        write_chrome_trace(_output, end)
+    else:
+        write_summary(end)
+
+
+def write_summary(end: float) -> None:
+    """Write per-phase times (ms) to stderr, nested phases indented."""
+
+    totals: dict[tuple[str, int], list[float]] = {}
+
+    for name, depth, start, stop in sorted(_spans, key=lambda span: span[2]):
+        totals.setdefault((name, depth), []).append(stop - start)
+
+    lines = ["  trace (ms)"]
+    for (name, depth), times in totals.items():
+        label = "  " * depth + name + (f" ({len(times)}x)" if len(times) > 1 else "")
+        lines.append(f"    {label:<32} {sum(times) * 1000:9.1f}")
+    lines.append(f"    {'total':<32} {(end - _start) * 1000:9.1f}")
+
+    sys.stderr.write("\n".join(lines) + "\n")
+
+
+def write_chrome_trace(path: str, end: float) -> None:
+    """Write spans as chrome trace (complete) events."""
+
+    import json
+
+    def event(name: str, start: float, stop: float) -> dict:
+        return {
+            "name": name,
+            "ph": "X",
+            "ts": (start - _start) * 1e6,
+            "dur": (stop - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": 0,
+        }
+
+    events = [event("sonia", _start, end)]
+    events += [event(name, start, stop) for name, _, start, stop in _spans]
+
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+if os.environ.get("SONIA_TRACE"):
+    enable(os.environ["SONIA_TRACE"])
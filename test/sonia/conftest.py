@@ -0,0 +1,19 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from sonia import notedb as db
+
+
+@pytest.fixture
+def db_path(request: pytest.FixtureRequest, tmp_path: Path) -> Iterator[Path]:
+    """Use a database in the temporary directory of the test (named by indirect
+    parametrization, test.db by default) as the note database. Restore the
+    previous note database after the test."""
+
+    saved_path = db.db_path
+    path = tmp_path / getattr(request, "param", "test.db")
+
+    assert db.set_path(str(path))
+    yield path
+    db.set_path(str(saved_path))
@@ -0,0 +1,36 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from sonia.asyncdb import AsyncNoteStore
+
+
+async def exercise_store(path: Path) -> None:
+    async with AsyncNoteStore(path, max_workers=3) as store:
+        await store.create_notes(("one :mit:", "two", "three :mit:"))
+
+        # concurrent readers
+        notes, tagged, matched = await asyncio.gather(
+            store.get_notes(),
+            store.get_tag_matches("mit"),
+            store.get_note_matches("TWO"),
+        )
+
+        assert [note.id for note in notes] == [1, 2, 3]
+        assert [note.id for note in tagged] == [1, 3]
+        assert [note.id for note in matched] == [2]
+
+        await store.update_note(2, "two :mit:")
+        await store.change((1, 3), "three", "four")
+        await store.delete_notes((1,))
+
+        assert [note.message for note in await store.get_notes()] == [
+            "two :mit:",
+            "four :mit:",
+        ]
+        assert [note.id for note in await store.search_notes("four")] == [3]
+
+
+@pytest.mark.parametrize("name", ["async_test.db", "async_test.sqlite"])
+def test_async_note_store(tmp_path: Path, name: str) -> None:
+    asyncio.run(exercise_store(tmp_path / name))
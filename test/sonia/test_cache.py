@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from sonia import cache
+from sonia import notedb as db
+
+
+@pytest.mark.parametrize(
+    "db_path", ["cache_test.db", "cache_test.sqlite"], indirect=True
+)
+def test_write_generation(db_path: Path) -> None:
+    assert db.get_generation() == ""
+
+    db.create_notes(("first :tod:", "second"))
+    generation = db.get_generation()
+
+    db.get_notes()
+    db.update_note(3, "missing")  # no note updated - still a write
+
+    assert db.get_generation() not in ("", generation)
+
+    generation = db.get_generation()
+    with db.transaction(write=True):
+        db.delete_notes((1,))
+        db.change_all("second", "changed")
+
+        assert db.get_generation() != generation  # bumped before the write
+
+    assert db.get_generation() != generation
+
+
+@pytest.mark.usefixtures("db_path")
+def test_view_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    db.create_notes(("first", "second"))
+    options = (None, 10)
+
+    assert cache.load_view("list", options) is None
+
+    notes = tuple(cache.caching_view("list", options, db.get_notes()))
+
+    assert cache.load_view("list", options) == list(notes)
+    assert cache.load_view("list", (None, 5)) is None  # other options
+    assert cache.load_view("short", options) is None  # other view
+
+    db.rebase()
+
+    assert cache.load_view("list", options) is None
+
+    # least recently used views are evicted beyond the cache size
+    monkeypatch.setattr(cache, "CACHE_SIZE", 1_000)
+    for limit in range(20):
+        tuple(cache.caching_view("list", (None, limit), db.get_notes()))
+
+    views = list(db.sidecar_path().glob(f"*{cache.VIEW_SUFFIX}"))
+
+    assert 0 < len(views) < 20
+    assert cache.load_view("list", (None, 19)) == list(db.get_notes())
+
+
+@pytest.mark.parametrize("db_path", ["replaced.db", "replaced.sqlite"], indirect=True)
+def test_view_cache_replaced_database(db_path: Path) -> None:
+    copy_path = db_path.with_name(f"copy-{db_path.name}")
+
+    db.create_notes(("first",))
+    db.close_connection()
+    shutil.copy(db_path, copy_path)
+
+    tuple(cache.caching_view("list", (), db.get_notes()))
+    assert cache.load_view("list", ()) is not None
+
+    # same sidecar (and generation), other database file
+    db.close_connection()
+    db_path.unlink()
+    assert cache.load_view("list", ()) is None
+
+    shutil.copy(copy_path, db_path)
+    assert cache.load_view("list", ()) is None
@@ -0,0 +1,156 @@
+import io
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sonia import commands as cmd
+from sonia import notedb as db
+from sonia import query
+
+
+def test_parse_batch_line() -> None:
+    assert cmd.parse_batch_line('add "one :tod:" two\n') == ["add", "one :tod:", "two"]
+    assert cmd.parse_batch_line('["change", "a b", "c"]') == ["change", "a b", "c"]
+    assert cmd.parse_batch_line("  # comment") == []
+    assert cmd.parse_batch_line("\n") == []
+
+    with pytest.raises(ValueError):
+        cmd.parse_batch_line('add "unbalanced')
+
+
+def test_parse_list_options() -> None:
+    parsed = cmd.parse_list_options(
+        ("mom", "--since", "this", "week", "--until=2026-01-31", "--limit", "5")
+    )
+    assert parsed is not None
+    args, options = parsed
+
+    assert args == ("mom",)
+    assert options == cmd.ListOptions(
+        limit=5,
+        since=query.parse_date("this week"),
+        until=datetime(2026, 1, 31),
+    )
+    assert cmd.parse_list_options(("--since", "soon")) is None
+    assert cmd.parse_list_options(("--limit", "-1")) is None
+    assert cmd.parse_list_options(("--limit=x",)) is None
+
+
+def test_dispatch_status() -> None:
+    assert cmd.dispatch(("version",))
+    assert not cmd.dispatch(("update", "one", "text"))
+    assert not cmd.dispatch(("unknown-command",))
+
+
+@pytest.mark.usefixtures("db_path")
+@pytest.mark.parametrize("single_transaction", [False, True])
+def test_batch(
+    tmp_path: Path, capsys: pytest.CaptureFixture, single_transaction: bool
+) -> None:
+    script = tmp_path / "script.txt"
+    script.write_text('add "one :tod:" two\nappend 1 more\ndone 2\ndone 7\n')
+
+    args = (str(script), "--transaction") if single_transaction else (str(script),)
+    cmd.dispatch(("batch", *args))
+
+    messages = [note.message for note in db.get_notes()]
+
+    output = capsys.readouterr().out
+
+    assert "batch line 4 failed" in output
+    if single_transaction:
+        assert messages == []  # rolled back
+    else:
+        assert messages == ["one :tod: more"]
+        assert "(1 failed)" in output
+
+
+@pytest.mark.usefixtures("db_path")
+def test_add_lines(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    count = cmd.ADD_CHUNK_SIZE + 5  # several chunks
+    monkeypatch.setattr(
+        "sys.stdin", io.StringIO("".join(f"line {i}\n\n" for i in range(count)))
+    )
+
+    cmd.dispatch(("add", "-"))
+
+    notes = db.get_notes()
+
+    assert [note.message for note in notes] == [f"line {i}" for i in range(count)]
+    assert f"added {count} notes" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("db_path", ["files.db", "files.sqlite"], indirect=True)
+def test_file_errors(
+    tmp_path: Path, db_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    malformed = tmp_path / "malformed.jsonl"
+    malformed.write_text('{"message": "one"}\n{"message": \n')
+
+    exported = cmd.dispatch(("export", str(tmp_path / "missing" / "notes.csv")))
+    imported = cmd.dispatch(("import", str(malformed)))
+
+    errors = capsys.readouterr().out.splitlines()
+
+    assert not exported
+    assert not imported
+    assert len(errors) == 2  # one line each, no traceback
+
+
+@pytest.mark.usefixtures("db_path")
+@pytest.mark.parametrize("single_transaction", [False, True])
+def test_batch_command_error(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+    single_transaction: bool,
+) -> None:
+    locked = []
+
+    def explode(_: tuple[str, ...]) -> None:
+        locked.append(db._write_lock.locked())
+        raise RuntimeError("exploded")
+
+    monkeypatch.setitem(cmd.commands, "explode", cmd.Command(("explode",), explode))
+
+    script = tmp_path / "script.txt"
+    script.write_text("add one\nexplode\nadd two\n")
+
+    args = (str(script), "--transaction") if single_transaction else (str(script),)
+    succeeded = cmd.dispatch(("batch", *args))
+
+    messages = [note.message for note in db.get_notes()]
+
+    output = capsys.readouterr().out
+
+    assert not succeeded
+    assert "command error (RuntimeError)" in output
+    assert "batch line 2 failed" in output
+    assert locked == [single_transaction]  # batch transaction writes
+    assert messages == ([] if single_transaction else ["one", "two"])
+
+
+@pytest.mark.usefixtures("db_path")
+@pytest.mark.parametrize(
+    ("script", "messages"),
+    [("done 3\nadd z\n", ["x", "y", "z"]), ("done 1\nrebase\n", ["y", "w"])],
+)
+def test_batch_reuses_display_ids(
+    tmp_path: Path, script: str, messages: list[str]
+) -> None:
+    path = tmp_path / "script.txt"
+    path.write_text(script)
+
+    db.create_notes(("x", "y", "w"))
+    db.close_connection()  # batch reads the notes back from the file
+
+    # a freed display identifier is taken again in the same transaction
+    succeeded = cmd.dispatch(("batch", str(path), "--transaction"))
+
+    notes = db.get_notes()
+
+    assert succeeded
+    assert [note.message for note in notes] == messages
+    assert [note.id for note in notes] == list(range(1, len(messages) + 1))
@@ -0,0 +1,70 @@
+import json
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import sonia
+from sonia import notedb as db
+
+
+COMPLETIONS_TOOL = Path(__file__).parents[2] / "tools" / "completions.py"
+
+# import the sonia under test in the probe (not an installed one)
+SONIA_SOURCE = str(Path(sonia.__file__).parents[1])
+
+# complete a command line in a fresh interpreter, report heavy imports
+COMPLETION_PROBE = f"""
+import json, runpy, sys
+runpy.run_path({str(COMPLETIONS_TOOL)!r}, run_name="__main__")
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & {{"duckdb", "rich", "sqlite3"}})
+print(json.dumps(heavy), file=sys.stderr)
+"""
+
+
+def complete(line: str) -> tuple[list[str], list[str]]:
+    """Return suggestions completing line, and heavy modules imported."""
+
+    proc = subprocess.run(
+        [sys.executable, "-c", COMPLETION_PROBE, "sonia", ""],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"COMP_LINE": line, "HOME": "/nonexistent", "PYTHONPATH": SONIA_SOURCE},
+    )
+
+    return proc.stdout.split(), json.loads(proc.stderr)
+
+
+@pytest.mark.parametrize(
+    "db_path", ["completion_test.db", "completion_test.sqlite"], indirect=True
+)
+def test_completions(db_path: Path) -> None:
+    db.create_notes(tuple(f"note {i} :tod:" for i in range(1, 13)))
+    db.create_notes(("call dentist :mit:",))
+    db.delete_notes((1, 11))
+
+    database = f"sonia db {db_path}"
+
+    suggestions, heavy = complete(f"{database} s")
+
+    assert {"short", "sls", "search", "serve"} <= set(suggestions)
+    assert heavy == []
+
+    assert complete(f"{database} tag ")[0] == ["mit", "tod"]
+    assert complete(f"{database} add call :m")[0] == [":mit:"]
+    assert complete(f"{database} done 1")[0] == ["10", "12", "13"]
+    assert complete(f"{database} done ")[0] == [
+        str(id) for id in (13, 12, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+    ]
+    assert complete(f"{database} update ")[0][0] == "13"
+    assert complete(f"{database} update 2 ")[0] == []
+
+
+def test_completion_index_location() -> None:
+    tool = runpy.run_path(str(COMPLETIONS_TOOL))
+
+    assert Path(tool["DEFAULT_DATABASE"]).expanduser() == Path.home() / ".sonia.db"
+    assert tool["SIDECAR_SUFFIX"] == db.SIDECAR_SUFFIX
+    assert tool["COMPLETION_FILE"] == db.COMPLETION_FILE
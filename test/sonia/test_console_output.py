@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+from sonia import console_output as cons
+from sonia import notedb as db
+
+
+def test_render_line_plain() -> None:
+    markup = f"  [{cons.CERR}]error[/]: missing ([{cons.CDIM}]\\[nid ...][/])"
+
+    assert cons.render_line(markup, color=False) == "  error: missing ([nid ...])"
+
+
+def test_render_line_color() -> None:
+    line = cons.render_line(f"[{cons.CERR}]error[/]", color=True)
+
+    assert line == "\033[38;2;255;0;0merror\033[39m"
+
+
+def test_render_line_other_styles() -> None:
+    assert cons.render_line("[bold]sonia[/]", color=False) is None
+
+
+def test_send_notes_pipe(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setenv("SONIA_ANIMATE", "1")  # ignored without a terminal
+    monkeypatch.setattr(cons, "sleep", lambda _: pytest.fail("animated"))
+
+    date = datetime(2025, 12, 6, 12, 35)
+    notes = [db.Note(nid, date, f"note {nid} :tag:") for nid in range(1, 2001)]
+
+    cons.send_notes(notes, reverse=True)
+
+    lines = capsys.readouterr().out.splitlines()
+
+    assert len(lines) == len(notes)
+    assert lines[0] == "  25.12.06 12:35 | 2000 | note 2000 :tag:"
+    assert lines[-1] == "  25.12.06 12:35 | 001 | note 1 :tag:"
+
+
+def test_color_message() -> None:
+    marked_up = cons.color_message("call (3) about :car: (later)")
+
+    assert marked_up == (
+        f"call ([{cons.CEMPH}]3[/{cons.CEMPH}]) about"
+        + f" [{cons.CDIM}]:car:[/{cons.CDIM}] (later)"
+    )
@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+# startup budgets (seconds) - imports plus command execution, excluding
+# interpreter start. generous to absorb slow machines; typical is well below
+STARTUP_BUDGETS: dict[str, float] = {
+    "version": 0.150,
+    "decide": 0.100,
+    "unknown-command": 0.100,
+}
+
+HEAVY_MODULES = ("duckdb", "rich", "sqlite3")
+
+
+# run a command in a fresh interpreter and report elapsed time and heavy imports
+STARTUP_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+sys.argv = ["sonia", *sys.argv[1:]]
+if "decide" in sys.argv:
+    import sonia.console_output as cons
+    cons.send_consider_pause = lambda duration: None  # skip animation
+from sonia.main import main
+main()
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}), file=sys.stderr)
+"""
+
+
+def probe_startup(*args: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stderr.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("command", STARTUP_BUDGETS)
+def test_cheap_command_startup(command: str) -> None:
+    result = probe_startup(command)
+
+    assert result["heavy"] == []
+    assert result["elapsed"] < STARTUP_BUDGETS[command]
+
+
+def test_cached_list_startup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SONIA_SOCKET", str(tmp_path / "sonia.sock"))  # no server
+    db_args = ("db", str(tmp_path / "cached.db"))
+
+    probe_startup(*db_args, "add", "cached note :tod:")
+
+    assert "duckdb" in probe_startup(*db_args, "list")["heavy"]  # cache miss
+    assert "duckdb" not in probe_startup(*db_args, "list")["heavy"]  # cache hit
+
+    probe_startup(*db_args, "add", "invalidating note")
+
+    assert "duckdb" in probe_startup(*db_args, "list")["heavy"]
@@ -1,12 +1,17 @@
+import asyncio
 import os
+import shutil
 from collections.abc import Iterator
 from pathlib import Path
 
+import duckdb
 import pytest
 from sonia import notedb as db
+from sonia.asyncdb import AsyncNoteStore
 
 
 test_path = str(Path(__file__).with_name("notedb_test.db"))
+legacy_test_path = str(Path(__file__).with_name("notedb_legacy_test.db"))
 
 
 entries: tuple[str, ...] = ("test_one", "test_two", "test_three")
@@ -16,6 +21,14 @@ def test_set_path() -> None:
     assert db.set_path(test_path)
 
 
+def test_shared_connection() -> None:
+    assert db.get_connection() is db.get_connection()
+
+    db.close_connection()
+
+    assert db.get_connection() is db.get_connection()
+
+
 def test_create_notes() -> None:
     confirmation_notes = db.create_notes(entries)
 
@@ -53,6 +66,34 @@ def test_update_and_read_note() -> None:
     assert notes[0].message == update_message
 
 
+def test_compound_updates() -> None:
+    assert db.missing_ids((3, 7, 1, 5)) == (7, 5)
+
+    appended = db.append_note(2, ":mit:")
+    assert appended is not None
+    assert appended.message == "test_two :mit:"
+    assert db.get_tag_matches("mit") == (appended,)
+
+    assert db.update_note(2, "test_two") is not None
+    assert db.update_note(7, "missing") is None
+    assert db.append_note(7, "missing") is None
+    assert db.reset_note(7) is None
+
+
+def test_reset_note() -> None:
+    original, *_ = db.create_notes(("reset me :tod:",))
+
+    reset = db.reset_note(original.id)
+
+    assert reset is not None
+    assert reset.id > original.id
+    assert reset.message == original.message
+    assert db.missing_ids((original.id,)) == (original.id,)
+    assert db.get_tag_matches("tod") == (reset,)
+
+    db.delete_notes((reset.id,))
+
+
 def test_get_tag_matches_unmatches() -> None:
     tag = "tag"
 
@@ -85,6 +126,71 @@ def test_rebase() -> None:
     assert db.get_notes()[0].id == 1
 
 
+def test_rebase_display_ids() -> None:
+    db.clear_database()
+    db.create_notes(("one", "two :tod:", "three :tod:", "four"))
+    db.delete_notes((2,))
+    db.reset_note(1)
+
+    db.rebase()
+
+    notes = db.get_notes()
+    nids = db.get_connection().execute("select nid from notes order by did;")
+
+    assert [(note.id, note.message) for note in notes] == [
+        (1, "three :tod:"),
+        (2, "four"),
+        (3, "one"),
+    ]
+    assert [nid for (nid,) in nids.fetchall()] == [3, 4, 1]  # stable
+    assert [note.id for note in db.get_tag_matches("tod")] == [1]
+
+
+def test_rebase_moves_into_vacated_ids() -> None:
+    db.clear_database()
+    db.create_notes(("one", "two", "three", "four"))
+    db.delete_notes((1,))
+    db.reset_note(2)  # note 2 moves to 5, then 3 and 4 move down
+
+    db.rebase()
+
+    assert [note.message for note in db.get_notes()] == ["three", "four", "two"]
+
+
+@pytest.mark.parametrize("name", ["concurrent.db", "concurrent.sqlite"])
+def test_concurrent_display_ids(tmp_path: Path, name: str) -> None:
+    async def create_concurrently() -> list[db.Note]:
+        async with AsyncNoteStore(tmp_path / name, max_workers=8) as store:
+            created = await asyncio.gather(
+                *(store.create_notes((f"note {i}",)) for i in range(40))
+            )
+            return [note for notes in created for note in notes]
+
+    notes = asyncio.run(create_concurrently())
+
+    assert sorted(note.id for note in notes) == list(range(1, 41))
+
+
+@pytest.mark.parametrize("name", ["duplicates.db", "duplicates.sqlite"])
+def test_unique_display_ids_migration(tmp_path: Path, name: str) -> None:
+    path = tmp_path / name
+    con = db.open_connection(path)
+    con.execute("drop index if exists notes_did_unique;")
+    con.execute(
+        "insert into notes (nid, did, date, message) values"
+        + " (1, 1, '2026-01-01', 'one'), (2, 1, '2026-01-02', 'two'),"
+        + " (3, 2, '2026-01-03', 'three');"
+    )
+    con.execute("update meta set value = 6 where key = 'schema_version';")
+    con.close()
+
+    con = db.open_connection(path)  # renumbers the duplicate after the newest
+    rows = con.execute("select did, message from notes order by did;").fetchall()
+    con.close()
+
+    assert rows == [(1, "one"), (2, "three"), (3, "two")]
+
+
 def test_change() -> None:
     assert db.set_path(test_path)
 
@@ -111,15 +217,223 @@ def test_change() -> None:
     assert db_notes[1].message == "test:two"
 
 
+def test_change_matches() -> None:
+    db.clear_database()
+    db.create_notes(("it's one :tod:", "two", "call three (3)"))
+
+    changed = db.change_all("it's", "it is")
+    assert [(note.id, note.message) for note in changed] == [(1, "it is one :tod:")]
+
+    changed = db.change((2, 3), r"(\w+) \((\d)\)", r"\2 \1", regex=True)
+    assert [(note.id, note.message) for note in changed] == [(3, "call 3 three")]
+
+    assert db.change_all(":tod:", ":mit:", regex=True)[0].id == 1
+    assert [note.id for note in db.get_tag_matches("mit")] == [1]
+
+    with pytest.raises(ValueError):
+        db.change_all("(", "", regex=True)
+
+
+@pytest.mark.parametrize(
+    ("db_path", "change_from", "change_to"),
+    [
+        ("regex.db", "(?<=t)wo", "oo"),  # no lookbehind in duckdb
+        ("regex.db", "two", r"\1"),  # no such group
+        ("regex.sqlite", "two", r"\1"),
+        ("regex.sqlite", "(t)wo", r"\g<name>"),
+    ],
+    indirect=["db_path"],
+)
+def test_change_invalid_regex(db_path: Path, change_from: str, change_to: str) -> None:
+    db.create_notes(("two",))
+
+    with pytest.raises(ValueError):
+        db.change_all(change_from, change_to, regex=True)
+
+    assert db.get_notes()[0].message == "two"
+
+
+def test_get_tagged_notes() -> None:
+    db.clear_database()
+    db.create_notes(("one :mit:", "two :tod: :que:", "three :MIT: :tod:", "four"))
+
+    def ids(notes: tuple[db.Note, ...]) -> list[int]:
+        return [note.id for note in notes]
+
+    assert ids(db.get_tagged_notes(any_of=("mit", "tod"))) == [1, 2, 3]
+    assert ids(db.get_tagged_notes(all_of=("mit", "TOD"))) == [3]
+    assert ids(db.get_tagged_notes(none_of=("que",))) == [1, 3, 4]
+    assert ids(db.get_tagged_notes(any_of=("tod",), none_of=("mit",))) == [2]
+
+    # tag index follows note changes
+    db.update_note(4, "four :tod:")
+    assert ids(db.get_tag_matches("tod")) == [2, 3, 4]
+
+    db.change((2,), ":tod:", "")
+    assert ids(db.get_tag_matches("tod")) == [3, 4]
+
+    db.delete_notes((1,))
+    db.rebase()
+    assert ids(db.get_tagged_notes(all_of=("mit", "tod"))) == [2]
+
+
+def test_search_notes() -> None:
+    db.clear_database()
+    db.create_notes(
+        (
+            "call the mechanic about the car",
+            "car wash",
+            "wash the cars, wash the bikes",
+            "invoice",
+        )
+    )
+
+    def ids(search: str) -> list[int]:
+        return [note.id for note in db.search_notes(search)]
+
+    assert ids("car") == [3, 2, 1]  # stemmed (cars), ties newest first
+    assert ids("washing") == [3, 2]  # ranked by term frequency
+    assert ids("mech car") == [1]  # every word, prefixes
+    assert ids("?") == []
+
+    # index follows note changes
+    db.update_note(4, "car invoice")
+    db.delete_notes((2,))
+    db.change_all("mechanic", "dealer")
+
+    assert ids("car") == [4, 3, 1]
+    assert ids("dealer") == [1]
+    assert ids("mechanic") == []
+
+
+def test_archive_notes() -> None:
+    db.clear_database()
+    db.create_notes(("pay invoice :tod:", "call mechanic", "file invoice :que:"))
+
+    archived = db.delete_notes((1, 3), archive=True)
+
+    assert [note.id for note in archived] == [1, 3]
+    assert [note.message for note in db.get_notes()] == ["call mechanic"]
+    assert db.get_tag_matches("tod") == ()
+    assert [note.message for note in db.search_archive("INVOICE :que:")] == [
+        "file invoice :que:"
+    ]
+    assert len(db.search_archive()) == 2
+
+    stats = db.archive_stats()
+
+    assert (stats.count, stats.live) == (2, 1)
+    assert stats.years == ((str(archived[0].date.year), 2),)
+    assert stats.last_archived is not None
+
+
+def test_create_notes_batches() -> None:
+    db.clear_database()
+
+    bulk_entries = tuple(f"bulk {i}" for i in range(db.get_engine().batch_size + 5))
+
+    notes = db.create_notes(bulk_entries)
+
+    assert [note.message for note in notes] == list(bulk_entries)
+    assert [note.id for note in notes] == list(range(1, len(bulk_entries) + 1))
+    assert len({note.date for note in notes}) == 1  # shared timestamp
+
+
+def test_iter_notes_pages() -> None:
+    count = len(db.get_notes())  # spans several fetches
+
+    newest = [note.id for note in db.iter_notes(descending=True)]
+    page = [note.id for note in db.iter_notes(descending=True, before=11, limit=3)]
+
+    assert newest == list(range(count, 0, -1))
+    assert page == [10, 9, 8]
+    assert [note.id for note in db.iter_notes(limit=2)] == [1, 2]
+
+
+@pytest.mark.parametrize("db_path", ["example.db"], indirect=True)
+def test_iter_notes_newest_example(db_path: Path) -> None:
+    shutil.copy(Path(__file__).parents[2] / "misc" / "example.db", db_path)
+
+    (newest,) = db.iter_notes(descending=True, limit=1)
+
+    assert newest == db.get_notes()[-1]
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv", ".parquet"])
+def test_export_import_notes(tmp_path: Path, suffix: str) -> None:
+    db.clear_database()
+    db.create_notes(("one :mit:", "two, with comma", 'three "quoted"'))
+    db.delete_notes((1,))
+
+    notes = db.get_notes()
+    path = str(tmp_path / f"notes{suffix}")
+
+    assert db.export_notes(path) == len(notes)
+
+    # remapped nids - numbered after existing notes
+    assert db.import_notes(path) == len(notes)
+    assert db.get_notes()[len(notes) :] == tuple(
+        note._replace(id=4 + i) for i, note in enumerate(notes)
+    )
+    assert [note.id for note in db.search_notes("comma")] == [4, 2]  # indexed
+
+    with pytest.raises(db.DuplicateNote):
+        db.import_notes(path, keep_ids=True)
+
+    db.clear_database()
+
+    # preserved nids
+    assert db.import_notes(path, keep_ids=True) == len(notes)
+    assert db.get_notes() == notes
+    assert db.create_notes(("four",))[0].id == notes[-1].id + 1
+
+
 def test_clear_database() -> None:
     db.clear_database()
 
     assert not db.get_notes()
 
 
+def test_schema_version() -> None:
+    assert (
+        db.get_schema_version(db.get_connection(), db.get_engine()) == db.SCHEMA_VERSION
+    )
+
+
+def test_migrate_legacy_database() -> None:
+    # database as created before schema versioning
+    con = duckdb.connect(legacy_test_path)
+    con.execute("create schema coredb;")
+    con.execute("set schema = coredb;")
+    con.execute("create sequence nid_sequence start 1;")
+    con.execute("""
+        create table notes (
+            nid integer primary key default nextval('nid_sequence'),
+            date timestamp,
+            message varchar
+        );
+    """)
+    con.execute("insert into notes (date, message) values (now(), 'legacy');")
+    con.close()
+
+    assert db.set_path(legacy_test_path)
+    assert (
+        db.get_schema_version(db.get_connection(), db.get_engine()) == db.SCHEMA_VERSION
+    )
+
+    db.create_notes(("migrated",))
+
+    assert [note.message for note in db.get_notes()] == ["legacy", "migrated"]
+
+    assert db.set_path(test_path)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def cleanup_notedb_test_database() -> Iterator[None]:
-    """Remove notedb test database file after tests."""
+    """Remove notedb test database files after tests."""
     yield
-    if os.path.exists(test_path):
-        os.remove(test_path)
+    db.close_connection()
+    for path in (test_path, legacy_test_path):
+        if os.path.exists(path):
+            os.remove(path)
+        shutil.rmtree(path + db.SIDECAR_SUFFIX, ignore_errors=True)
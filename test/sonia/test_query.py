@@ -0,0 +1,78 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sonia import notedb as db
+from sonia import query
+
+
+def test_tokenize() -> None:
+    assert query.tokenize(':MIT: or not ("two words" x\\y)') == [
+        ("tag", "mit"),
+        ("keyword", "or"),
+        ("keyword", "not"),
+        ("paren", "("),
+        ("text", "two words"),
+        ("text", "x\\y"),
+        ("paren", ")"),
+    ]
+
+
+@pytest.mark.parametrize("expression", ["not", "(a", "a )", 'a "b', "since", "since x"])
+def test_compile_filter_errors(expression: str) -> None:
+    with pytest.raises(query.FilterSyntaxError):
+        query.compile_filter(expression)
+
+
+def test_parse_date() -> None:
+    now = datetime(2026, 3, 4, 15, 30)
+
+    assert query.parse_date("today", now) == datetime(2026, 3, 4)
+    assert query.parse_date("yesterday", now) == datetime(2026, 3, 3)
+    assert query.parse_date("7d", now) == datetime(2026, 2, 25, 15, 30)
+    assert query.parse_date("2026-01-02", now) == datetime(2026, 1, 2)
+
+    # calendar periods (2026-03-04 is a wednesday)
+    assert query.parse_date("this week", now) == datetime(2026, 3, 2)
+    assert query.parse_date("last week", now) == datetime(2026, 2, 23)
+    assert query.parse_date("last month", datetime(2026, 1, 9)) == datetime(2025, 12, 1)
+    assert query.parse_date("this year", now) == datetime(2026, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "db_path", ["query_test.db", "query_test.sqlite"], indirect=True
+)
+def test_filter_notes(db_path: Path) -> None:
+    db.create_notes(
+        (
+            "pay invoice :mit:",
+            "car invoice :tod: :que:",
+            "call mechanic :tod:",
+            "read :que:",
+            "50% off_season",
+        )
+    )
+
+    def ids(expression: str) -> list[int]:
+        return [note.id for note in db.select_notes(*query.compile_filter(expression))]
+
+    assert ids("") == [1, 2, 3, 4, 5]
+    assert ids(":mit: or :tod: and not :que:") == [1, 3]  # and binds tighter
+    assert ids("(:mit: or :tod:) and not :que:") == [1, 3]
+    assert ids("INVOICE :tod:") == [2]
+    assert ids("not (invoice or :que:)") == [3, 5]
+    assert ids("50%") == [5]  # literal - no wildcards
+    assert ids("%") == [5]
+    assert ids("0_") == []  # would match "0%"
+    assert ids("off_s") == [5]
+    assert ids(r'"\\"') == []
+    assert ids("since 1d") == [1, 2, 3, 4, 5]
+    assert ids("until 1d") == []
+    assert ids("since this week") == [1, 2, 3, 4, 5]
+
+    # date bounded lists and searches
+    week = query.parse_date("7d")
+    assert [note.id for note in db.select_notes(since=week, limit=2)] == [1, 2]
+    assert list(db.select_notes(until=week)) == []
+    assert [note.id for note in db.search_notes("invoice", since=week)] == [2, 1]
+    assert db.search_notes("invoice", until=week) == ()
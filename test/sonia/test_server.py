@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+
+import pytest
+import sonia
+from sonia import notedb as db
+from sonia import server
+
+
+def request(args: list[str]) -> bytes:
+    """Return output frames of command run by the server."""
+
+    client, con = socket.socketpair()
+    frames = []
+
+    with client, con:
+        client_request = server.client_request(args)
+        client.sendall(json.dumps(client_request).encode() + b"\n")
+
+        # input streams in and output streams out while the command runs, like
+        # with the forwarding client
+        if client_request["stdin"]:
+            threading.Thread(target=server.send_stdin, args=(client,)).start()
+        receiver = threading.Thread(
+            target=lambda: frames.append(client.makefile("rb").read())
+        )
+        receiver.start()
+
+        server.handle_request(con)
+        con.shutdown(socket.SHUT_WR)
+        receiver.join()
+
+    return frames[0]
+
+
+def test_handle_request() -> None:
+    frames = request(["version"])
+
+    assert frames[:1] == server.STDOUT
+    output = frames[server.FRAME_HEADER_SIZE :].decode()
+
+    assert output.split() == ["sonia", sonia.__version__]
+
+
+def test_handle_request_restores_environment() -> None:
+    environ = dict(os.environ)
+
+    request(["unknown-command"])
+
+    assert dict(os.environ) == environ
+
+
+@pytest.mark.usefixtures("db_path")
+def test_handle_request_stdin(monkeypatch: pytest.MonkeyPatch) -> None:
+    count = server.STDIN_CHUNK_SIZE // 8  # several chunks
+    lines = ["one", "two :tod:", *(f"line {i}" for i in range(count))]
+    monkeypatch.setattr(
+        "sys.stdin", io.TextIOWrapper(io.BytesIO("\n".join(lines).encode()))
+    )
+
+    request(["add", "-"])  # input streamed after the request
+
+    messages = [note.message for note in db.get_notes()]
+
+    assert messages == lines
+
+
+def test_forward_without_server(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("SONIA_SOCKET", str(tmp_path / "sonia.sock"))
+
+    assert not server.forward(["version"])
+
+
+def test_reads_stdin() -> None:
+    assert server.reads_stdin(["batch"])
+    assert server.reads_stdin(["db", "notes.db", "batch", "-", "--transaction"])
+    assert not server.reads_stdin(["batch", "script.txt"])
+    assert server.reads_stdin(["add", "-"])
+    assert not server.reads_stdin(["add", "--file", "notes.txt"])
+    assert not server.reads_stdin(["add"])
+    assert not server.reads_stdin(["list"])
@@ -0,0 +1,148 @@
+import os
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from sonia import notedb as db
+from sonia import storage
+
+
+duckdb_path = str(Path(__file__).with_name("storage_test.db"))
+sqlite_path = str(Path(__file__).with_name("storage_test.sqlite"))
+copy_path = str(Path(__file__).with_name("storage_copy_test.db"))
+
+
+entries: tuple[str, ...] = ("test_one :tag:", "test_two", "test_three :tag:")
+
+
+def test_engine_for_new_files() -> None:
+    assert storage.engine_for(Path(duckdb_path)).name == "duckdb"
+    assert storage.engine_for(Path(sqlite_path)).name == "sqlite"
+
+
+def test_engine_overrides_required() -> None:
+    class PartialEngine(storage.Engine):
+        def connect(self, path: Path) -> storage.Connection:
+            raise OSError(path)
+
+    with pytest.raises(TypeError):
+        PartialEngine()  # ty: ignore[call-non-callable]
+
+
+def test_sqlite_notes() -> None:
+    assert db.set_path(sqlite_path)
+    assert db.get_engine().name == "sqlite"
+
+    db.create_notes(entries)
+    db.delete_notes((2,), archive=True)
+    db.rebase()
+    db.change_all("test_", "done_")
+
+    notes = db.get_notes()
+
+    assert [note.id for note in notes] == [1, 2]
+    assert notes[1].message == "done_three :tag:"
+    assert len(db.get_tag_matches("TAG")) == 2
+    assert len(db.get_note_unmatches("three")) == 1
+    assert [note.id for note in db.search_notes("done thr")] == [2]
+    assert [note.message for note in db.search_archive("TWO")] == ["test_two"]
+
+    # sequence restarts after rebased notes
+    (note,) = db.create_notes(("test_four",))
+    assert note.id == 3
+
+    # regular expression functions
+    changed = db.change_all(r"test_(\w+)", r"\1's", regex=True)
+    assert [(note.id, note.message) for note in changed] == [(3, "four's")]
+
+
+def test_engine_for_existing_files() -> None:
+    db.close_connection()
+
+    # header wins over suffix
+    os.rename(sqlite_path, duckdb_path)
+
+    assert storage.engine_for(Path(duckdb_path)).name == "sqlite"
+
+    os.rename(duckdb_path, sqlite_path)
+
+
+def test_copy_notes() -> None:
+    sqlite_notes = (db.set_path(sqlite_path), db.get_notes())[1]
+    db.close_connection()
+
+    assert db.copy_notes(sqlite_path, copy_path) == len(sqlite_notes)
+
+    assert db.set_path(copy_path)
+    assert db.get_engine().name == "duckdb"
+    assert db.get_notes() == sqlite_notes
+    assert [note.message for note in db.search_archive()] == ["test_two"]
+
+    # identifiers continue after copied notes
+    (note,) = db.create_notes(("test_five",))
+    assert note.id == sqlite_notes[-1].id + 1
+
+    db.close_connection()
+
+    with pytest.raises(db.DatabaseNotEmpty):
+        db.copy_notes(sqlite_path, copy_path)
+
+
+@pytest.mark.parametrize(
+    ("db_path", "target"),
+    [("archived.sqlite", "copy.db"), ("archived.db", "copy.sqlite")],
+    indirect=["db_path"],
+)
+def test_copy_notes_after_archive(tmp_path: Path, db_path: Path, target: str) -> None:
+    db.create_notes(("one", "two", "three"))
+    db.delete_notes((3,), archive=True)  # highest nid
+    db.close_connection()
+
+    db.copy_notes(str(db_path), str(tmp_path / target))
+
+    db.set_path(str(tmp_path / target))
+    db.create_notes(("four",))
+    nids = db.get_connection().execute("select nid from notes;").fetchall()
+
+    assert sorted(nid for (nid,) in nids) == [1, 2, 4]  # archived nid not reused
+
+
+def test_sqlite_create_notes_batches() -> None:
+    assert db.set_path(sqlite_path)
+
+    db.clear_database()
+
+    bulk_entries = tuple(f"bulk {i}" for i in range(db.get_engine().batch_size + 5))
+
+    notes = db.create_notes(bulk_entries)
+
+    assert [note.message for note in notes] == list(bulk_entries)
+    assert [note.id for note in notes] == list(range(1, len(bulk_entries) + 1))
+    assert len({note.date for note in notes}) == 1
+
+
+def test_sqlite_export_notes(tmp_path: Path) -> None:
+    assert db.set_path(sqlite_path)
+
+    notes = db.get_notes()
+
+    for name in ("notes.jsonl", "notes.csv", "notes.parquet"):
+        assert db.export_notes(str(tmp_path / name)) == len(notes)
+
+        db.clear_database()
+
+        assert db.import_notes(str(tmp_path / name), keep_ids=True) == len(notes)
+        assert db.get_notes() == notes
+
+
+@pytest.fixture(scope="module", autouse=True)
+def cleanup_storage_test_databases() -> Iterator[None]:
+    """Remove storage test database files after tests."""
+    yield
+    db.close_connection()
+    for path in (duckdb_path, sqlite_path, copy_path):
+        for file in (path, path + "-wal", path + "-shm", path + ".wal"):
+            if os.path.exists(file):
+                os.remove(file)
+        shutil.rmtree(path + db.SIDECAR_SUFFIX, ignore_errors=True)
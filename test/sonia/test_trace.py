@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sonia import trace
+
+
+def test_span_disabled() -> None:
+    assert not trace.enabled
+    assert trace.span("query") is trace.span("render")
+
+
+def test_chrome_trace(tmp_path: Path) -> None:
+    output = tmp_path / "trace.json"
+    env = os.environ | {
+        "SONIA_TRACE": str(output),
+        "SONIA_SOCKET": str(tmp_path / "sonia.sock"),
+    }
+
+    subprocess.run(
+        [sys.executable, "-m", "sonia", "db", str(tmp_path / "notes.db"), "ls"],
+        capture_output=True,
+        env=env,
+        check=True,
+    )
+
+    events = json.loads(output.read_text())["traceEvents"]
+    names = {event["name"] for event in events}
+
+    assert {"sonia", "command", "open database", "query"} <= names
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
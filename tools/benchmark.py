@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# Time notedb functions and end-to-end sonia commands on synthetic databases
+# of increasing size. Results are written as JSON for comparison between
+# releases, e.g.
+#
+#   python tools/benchmark.py --sizes 1000 100000 --output bench-0.3.8.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+import sonia
+from sonia import notedb as db
+
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+# tag frequencies (share of notes) - a few workflow tags dominate
+TAG_WEIGHTS = {
+    "que": 0.30,
+    "tod": 0.12,
+    "note": 0.10,
+    "mit": 0.05,
+    "groc": 0.04,
+    "work": 0.04,
+    "book": 0.02,
+    "idea": 0.02,
+    "call": 0.01,
+    "done": 0.01,
+}
+
+WORDS: tuple[str, ...] = (
+    "call", "review", "invoice", "car", "mechanic", "book", "dentist", "pay",
+    "bill", "email", "send", "draft", "report", "meeting", "plan", "budget",
+    "groceries", "milk", "bread", "fix", "bike", "garden", "tax", "renew",
+    "passport", "order", "parts", "schedule", "project", "notes", "read",
+    "write", "clean",
+)  # fmt: skip
+
+# benchmarked notedb functions - (name, function of database size)
+NOTEDB_BENCHMARKS: tuple[tuple[str, Callable[[int], object]], ...] = (
+    ("get_notes", lambda size: db.get_notes()),
+    ("get_tag_matches", lambda size: db.get_tag_matches("mit")),
+    ("get_note_matches", lambda size: db.get_note_matches("invoice")),
+    ("search_notes", lambda size: db.search_notes("invoice car")),
+    (
+        "create_notes",
+        lambda size: db.create_notes(tuple(f"bench {i} :tod:" for i in range(100))),
+    ),
+    ("change_all", lambda size: db.change_all("invoice", "bill")),
+    (
+        "delete_notes",
+        lambda size: db.delete_notes(tuple(range(1, size + 1, 100))),
+    ),
+    ("rebase", lambda size: db.rebase()),
+)
+
+# benchmarked commands (arguments after sonia db path)
+CLI_BENCHMARKS: tuple[tuple[str, ...], ...] = (
+    ("version",),
+    ("focus",),
+    ("list",),
+    ("add", "benchmark note :tod:"),
+)
+
+
+## synthetic databases ##
+
+
+def synthetic_messages(size: int, seed: int = 0) -> list[str]:
+    """Return messages with a realistic mix of words, tags and references."""
+
+    rng = random.Random(seed)
+    tags, weights = zip(*TAG_WEIGHTS.items())
+    messages = []
+
+    for _ in range(size):
+        words: list[str] = rng.choices(WORDS, k=rng.randint(2, 12))
+
+        if rng.random() < 0.1:
+            words.append(f"({rng.randint(1, 99)})")
+
+        for tag, weight in zip(tags, weights):
+            if rng.random() < weight:
+                words.append(f":{tag}:")
+
+        messages.append(" ".join(words))
+
+    return messages
+
+
+def create_database(path: Path, size: int, seed: int = 0) -> None:
+    """Create database with size synthetic notes, one per minute up to now,
+    with gaps in the nids (deleted notes)."""
+
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(minutes=size)
+    nid = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        notes_path = Path(directory) / "notes.jsonl"
+
+        with open(notes_path, "w") as file:
+            for minute, message in enumerate(synthetic_messages(size, seed)):
+                nid += 2 if rng.random() < 0.05 else 1
+                date = start + timedelta(minutes=minute)
+                row = {"nid": nid, "date": str(date), "message": message}
+                file.write(json.dumps(row) + "\n")
+
+        db.set_path(str(path))
+        db.import_notes(str(notes_path), keep_ids=True)
+        db.close_connection()
+
+
+## timing ##
+
+
+def elapsed(run: Callable[[], object]) -> float:
+    """Return seconds taken by run."""
+
+    start = time.perf_counter()
+    run()
+
+    return time.perf_counter() - start
+
+
+def bench_notedb(template: Path, scratch: Path, size: int, repeat: int) -> list[dict]:
+    """Time notedb functions, each run on a fresh copy of the database."""
+
+    results = []
+
+    for name, func in NOTEDB_BENCHMARKS:
+        runs = []
+
+        for _ in range(repeat):
+            db.close_connection()
+            shutil.copy(template, scratch)
+            db.set_path(str(scratch))
+            db.get_connection()  # exclude opening the database
+
+            runs.append(elapsed(partial(func, size)))
+
+        results.append(result("notedb", name, size, runs))
+
+    db.close_connection()
+
+    return results
+
+
+def bench_cli(template: Path, scratch: Path, size: int, repeat: int) -> list[dict]:
+    """Time sonia commands in fresh interpreters (startup included)."""
+
+    results = []
+
+    # never forward to a running sonia server
+    env = os.environ | {"SONIA_SOCKET": str(scratch.with_suffix(".sock"))}
+
+    for args in CLI_BENCHMARKS:
+        runs = []
+
+        for _ in range(repeat):
+            shutil.copy(template, scratch)
+            command = [sys.executable, "-m", "sonia", "db", str(scratch), *args]
+            run = partial(
+                subprocess.run, command, stdout=subprocess.DEVNULL, env=env, check=True
+            )
+            runs.append(elapsed(run))
+
+        results.append(result("cli", " ".join(args[:1]), size, runs))
+
+    return results
+
+
+def result(kind: str, name: str, size: int, runs: list[float]) -> dict:
+    return {
+        "kind": kind,
+        "name": name,
+        "size": size,
+        "median": statistics.median(runs),
+        "min": min(runs),
+        "runs": runs,
+    }
+
+
+## main ##
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark notedb functions and sonia commands."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--suffix", default=".db", help=".db (DuckDB) or .sqlite")
+    parser.add_argument("--output", type=Path, help="results file (default stdout)")
+    parser.add_argument("--workdir", type=Path, help="keep generated databases here")
+    options = parser.parse_args()
+
+    workdir = options.workdir or Path(tempfile.mkdtemp(prefix="sonia-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+
+    for size in options.sizes:
+        template = workdir / f"notes-{size}{options.suffix}"
+        scratch = workdir / f"scratch-{size}{options.suffix}"
+
+        if not template.exists():
+            print(f"generating {size} notes", file=sys.stderr)
+            create_database(template, size)
+
+        for bench in (bench_notedb, bench_cli):
+            for entry in bench(template, scratch, size, options.repeat):
+                print(
+                    f"{entry['size']:>9} {entry['kind']:>6} {entry['name']:<18}"
+                    + f" {entry['median'] * 1000:10.1f} ms",
+                    file=sys.stderr,
+                )
+                results.append(entry)
+
+    report = {
+        "sonia": sonia.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "database": options.suffix,
+        "results": results,
+    }
+
+    if options.output:
+        options.output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if not options.workdir:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,161 @@
 #!/usr/bin/env python3
 # Use the part of the subcommand, option, etc., being typed
 # to provide suggested completions (suggestions).
+#
+# Subcommands come from the sonia command registry. Tags (:tag:) and note ids
+# come from the completion index notedb writes next to the database after
+# every write - completing never opens the database (or loads rich). Register
+# with bash (-o default completes file names, e.g. after db or import):
+#
+#   complete -o default -C "python /path/to/tools/completions.py" sonia
 
+import os
 import sys
+from collections.abc import Iterator
+from itertools import islice
 
+from sonia import commands as sc
 
-SUBCOMMANDS_AND_OPTIONS = (
-    "add",
-    "capture",
-    "list",
-    "focus",
-    "search",
-    "update",
-    "append",
-    "tag",
-    "rebase",
-    "done",
-    "remove",
-    "rm",
-    "complete",
-    "change",
-    "reset",
-    "touch",
-    "version",
-    "db",
-    "decide",
-)
-
-
-def get_suggestions(stub: str) -> str:
-    """Use the word STUB to return a list of relevant suggestions."""
-    return "\n".join(cmd for cmd in SUBCOMMANDS_AND_OPTIONS if cmd.startswith(stub))
+
+# mirror notedb (db_path, SIDECAR_SUFFIX, COMPLETION_FILE) - importing notedb
+# costs more than the whole completion
+DEFAULT_DATABASE = os.path.join("~", ".sonia.db")
+SIDECAR_SUFFIX = ".cache"
+COMPLETION_FILE = "completion"
+
+# most suggestions offered (bash asks before showing long lists anyway)
+SUGGESTION_LIMIT = 50
+
+# commands completing note ids - every argument, or the first only
+ID_COMMANDS = (sc.delete_cmd, sc.done_cmd)
+FIRST_ID_COMMANDS = (sc.update_cmd, sc.append_cmd, sc.reset_cmd)
+
+
+def load_index(database: str) -> dict[str, list[str]]:
+    """Return completion index of database - tags and id ranges - empty if never
+    written."""
+
+    path = os.path.expanduser(database) + SIDECAR_SUFFIX
+
+    try:
+        with open(os.path.join(path, COMPLETION_FILE)) as file:
+            return {key: values for key, *values in map(str.split, file)}
+    except (OSError, ValueError):
+        return {}
+
+
+def command_suggestions(stub: str) -> list[str]:
+    """Return command ids starting with stub (dashed ids only for dashed stubs)."""
+
+    return [
+        id
+        for id in sc.commands
+        if id.startswith(stub) and (stub.startswith("-") or id[0].isalpha())
+    ]
+
+
+def tag_suggestions(stub: str, index: dict[str, list[str]]) -> list[str]:
+    """Return tags starting with stub, as :tag: if the stub starts with a colon."""
+
+    if stub.startswith(":"):
+        tags = (f":{tag}:" for tag in index.get("tags", ()))
+    else:
+        tags = iter(index.get("tags", ()))
+
+    return [tag for tag in tags if tag.startswith(stub)]
+
+
+def id_ranges(index: dict[str, list[str]]) -> list[tuple[int, int]]:
+    """Return (first, last) ranges of note ids in index, in order - ids of done
+    and removed notes are left out until rebase."""
+
+    ranges = []
+
+    for ids in index.get("ids", ()):
+        first, _, last = ids.partition("-")
+        ranges.append((int(first), int(last or first)))
+
+    return ranges
+
+
+def id_suggestions(stub: str, index: dict[str, list[str]]) -> list[str]:
+    """Return note ids starting with stub (newest ids if there is no stub)."""
+
+    if (stub and not stub.isdigit()) or stub.startswith("0"):
+        return []
+
+    try:
+        ranges = id_ranges(index)
+    except ValueError:
+        return []
+
+    if not ranges:
+        return []
+
+    if not stub:
+        newest = (
+            id for first, last in reversed(ranges) for id in range(last, first - 1, -1)
+        )
+        return [str(id) for id in islice(newest, SUGGESTION_LIMIT)]
+
+    # ids with stub as prefix - stub, stub0..stub9, stub00..stub99, ...
+    def prefixed() -> Iterator[int]:
+        start = int(stub)
+        while start <= ranges[-1][1]:
+            end = start + 10 ** (len(str(start)) - len(stub))
+            for first, last in ranges:
+                yield from range(max(start, first), min(end, last + 1))
+            start *= 10
+
+    return [str(id) for id in islice(prefixed(), SUGGESTION_LIMIT)]
+
+
+def get_suggestions(words: list[str], stub: str) -> list[str]:
+    """Return suggestions for stub, the word being typed after words (sonia
+    and its arguments so far)."""
+
+    args = words[1:]
+    database = DEFAULT_DATABASE
+
+    if args[:1] == ["db"]:
+        if len(args) < 2:
+            return []  # database path (file names)
+        database, args = args[1], args[2:]
+
+    if not args:
+        return command_suggestions(stub)
+
+    command = sc.commands.get(args[0])
+
+    if command is sc.tag_cmd and len(args) == 1:
+        return tag_suggestions(stub, load_index(database))
+
+    if stub.startswith(":"):
+        return tag_suggestions(stub, load_index(database))
+
+    if command in ID_COMMANDS or (command in FIRST_ID_COMMANDS and len(args) == 1):
+        return id_suggestions(stub, load_index(database))
+
+    return []
+
+
+def completed_words() -> tuple[list[str], str]:
+    """Return words before the word being typed, and the word being typed, from
+    the bash completion environment (or arguments if run by hand)."""
+
+    line = os.environ.get("COMP_LINE")
+
+    if line is None:
+        # sonia_completions.py sonia stub [previous]
+        return sys.argv[1:2] + sys.argv[3:4], sys.argv[2]
+
+    line = line[: int(os.environ.get("COMP_POINT", len(line)))]
+    words = line.split()
+
+    if line.endswith((" ", "\t")) or not words:
+        return words, ""
+
+    return words[:-1], words[-1]
 
 
 if __name__ == "__main__":
@@ -40,6 +165,7 @@ if __name__ == "__main__":
     # 1.  Script: sonia_completions.py (The logic provider)
     # 2.  Command ($1 / argv[1]): sonia (The context/namespace)
     # 3.  Stub ($2 / argv[2]): sub (What you typed so far)
+    # 4.  Line (COMP_LINE): sonia sub (Everything typed so far)
     #
     # bash expects newline-separated completions sent to standard output (stdout)
-    print(get_suggestions(sys.argv[2]))
+    print("\n".join(get_suggestions(*completed_words())))